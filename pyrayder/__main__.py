@@ -1,20 +1,134 @@
 """This is the main entry point for the program"""
 
+import argparse
+import sys
+import time
+
+# when the program started, before the slow imports below, so the benchmark can report how long starting takes
+START_TIME = time.perf_counter()
+
+import pygame
+
+import asset_loader
+import colors
+import level
 import settings
+import ui_text
 
+from frame_pipeline import FramePipeline
 from game import Game
 from keyboard_input_handler import KeyboardInputHandler
 from player import Player
-from renderer import Renderer
+from profiler import FrameProfiler
+from renderer import Renderer, get_texture_ids
+from resolution_controller import ResolutionController
+
+
+def parse_arguments():
+    """read the command line. Running with no arguments plays the game"""
+
+    parser = argparse.ArgumentParser(prog='pyrayder')
+    parser.add_argument('--level', metavar='FILE', help='play this level file (.txt or .lvl) instead of settings.MAP')
+    parser.add_argument('--render-scale', type=float, default=settings.RENDER_SCALE,
+                        help='draw the view at this fraction of the screen size and scale it up, e.g. 0.5')
+    parser.add_argument('--dynamic-resolution', action='store_true', default=settings.DYNAMIC_RESOLUTION,
+                        help='lower the render scale when frames are slow and raise it again when they are quick')
+    parser.add_argument('--pipelined', action='store_true', default=settings.PIPELINED_RENDERING,
+                        help='cast the rays for the next frame on a thread while drawing the current one')
+    parser.add_argument('--profile', action='store_true', help='time every stage of each frame and show it on screen')
+    parser.add_argument('--profile-json', metavar='FILE', help='profile, and save a summary of the timings here on exit')
+    parser.add_argument('--chrome-trace', metavar='FILE',
+                        help='profile, and save every timing here on exit for chrome://tracing')
+    commands = parser.add_subparsers(dest='command')
+
+    bench = commands.add_parser('bench', help='render a scripted camera path without a window and report timings')
+    bench.add_argument('--frames', type=int, default=300, help='how many frames to render')
+    bench.add_argument('--workers', type=int, default=settings.RENDER_WORKERS,
+                       help='how many processes to draw walls with')
+    bench.add_argument('--dump-reference', metavar='FOLDER', help='save every frame to this folder')
+    bench.add_argument('--check-reference', metavar='FOLDER',
+                       help='check every frame matches the frames saved in this folder')
+
+    verify = commands.add_parser('verify', help='check the fast renderers match the reference ones and time them')
+    verify.add_argument('--save-baseline', metavar='FILE', help='save the frame hashes and timings to this file')
+    verify.add_argument('--baseline', metavar='FILE',
+                        help='fail if frames differ from, or anything is slower than, the ones saved in this file')
+    verify.add_argument('--tolerance', type=float, default=0.25,
+                        help='how much slower than the baseline things may get, e.g. 0.25 for 25%%')
+
+    commands.add_parser('pvs', help='build the sprite visibility index of the level ahead of time, however big it is')
+
+    return parser.parse_args()
+
+
+def show_loading_screen(screen):
+    """show something in the window straight away, while the textures load"""
+
+    screen.fill(colors.BLACK)
+
+    text = ui_text.get_font(48).render('loading...', True, colors.YELLOW)
+    screen.blit(text, text.get_rect(center=screen.get_rect().center))
+
+    pygame.display.update()
+
 
 if __name__ == "__main__":
 
-    renderer = Renderer()
+    arguments = parse_arguments()
+
+    game_level = level.load_level(arguments.level)
+
+    settings.RENDER_SCALE = arguments.render_scale
+
+    if arguments.command == 'bench':
+        import benchmark
+
+        settings.RENDER_WORKERS = arguments.workers
+        sys.exit(benchmark.run(game_level, arguments.frames, arguments.dump_reference, arguments.check_reference,
+                               arguments.pipelined, START_TIME))
+
+    if arguments.command == 'verify':
+        import regression
+
+        sys.exit(regression.run(game_level, arguments.save_baseline, arguments.baseline, arguments.tolerance))
+
+    if arguments.command == 'pvs':
+        import visibility
+
+        path = visibility.save_visibility_index(game_level, settings.SPRITE_BUCKET_SIZE)
+        print(f'saved the visibility index to {path}')
+        sys.exit(0)
+
+    # only start the parts of pygame we use, as pygame.init would start the audio and joysticks too, which is slow.
+    # Open the window first so there is something to look at while the textures are read in the background.
+    pygame.display.init()
+    pygame.font.init()
+
+    assets = asset_loader.AssetManager()
+    show_loading_screen(pygame.display.set_mode(settings.SCREEN_SIZE))
+    assets.preload(get_texture_ids(assets))
+
+    profiler = FrameProfiler(arguments.profile or arguments.profile_json or arguments.chrome_trace)
+    renderer = Renderer(game_level, profiler, assets)
 
     player = Player(settings.PLAYER_START_POSITION,
                     settings.PLAYER_START_DIRECTION, settings.PLAYER_START_CAMERA_PLANE)
 
-    input_handler = KeyboardInputHandler()
+    input_handler = KeyboardInputHandler(game_level)
+
+    resolution_controller = None
 
-    game = Game(renderer, player, input_handler)
+    if arguments.dynamic_resolution:
+        resolution_controller = ResolutionController(
+            1000 / settings.TARGET_FPS, settings.RENDER_SCALE, settings.MIN_RENDER_SCALE, settings.RENDER_SCALE)
+
+    pipeline = FramePipeline(renderer) if arguments.pipelined else None
+
+    game = Game(renderer, player, input_handler, resolution_controller, pipeline)
     game.run()
+
+    if arguments.profile_json:
+        profiler.export_json(arguments.profile_json)
+
+    if arguments.chrome_trace:
+        profiler.export_chrome_trace(arguments.chrome_trace)
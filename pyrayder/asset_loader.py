@@ -1,18 +1,215 @@
 """This is a helper module to load assets such as tectures etc."""
 
+import hashlib
+import json
 import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pygame
 
+import settings
+from texture_atlas import TextureAtlas
+
+ASSET_FOLDER = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'assets')
+MANIFEST_PATH = os.path.join(ASSET_FOLDER, 'manifest.json')
+
+
+def get_texture(texture_path):
+    """Load a single texture and convert it to the display's pixel format so it draws quickly"""
+
+    return pygame.image.load(texture_path).convert()
+
+
+def get_texture_atlas(textures):
+    """Build a texture atlas holding every shaded variant of the textures, using the fog settings"""
+
+    return TextureAtlas(textures, settings.FOG_LEVELS, settings.FOG_DISTANCE, settings.FOG_COLOR)
+
+
+class AssetManager:
+    """This type loads textures by the stable ids given to them in a manifest, and keeps them once loaded.
+
+    The manifest maps every texture id to its file, and names groups of ids (like 'walls') whose order never
+    changes, so texture indices don't depend on the order files happen to be listed in on disk.
+
+    Textures are loaded the first time they are asked for. Once a texture has been converted to the display's
+    pixel format its pixels are saved in the cache folder, so later runs memory map them straight into a surface
+    without decoding the PNG or converting it again. Cached pixels are only used if the texture file and the
+    display's pixel format are the same as when they were saved.
+
+    Files can also be read on background threads ahead of time with preload, so the game can show something
+    while they load. Only getting a texture turns it into a surface, as that has to happen on the main thread.
+    """
+
+    def __init__(self, manifest_path=MANIFEST_PATH, cache_folder=settings.ASSET_CACHE_FOLDER, load_threads=4):
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+
+        self._asset_folder = os.path.dirname(manifest_path)
+        self._entries = manifest['textures']
+        self._groups = manifest['groups']
+        self._cache_folder = cache_folder
+        self._load_threads = load_threads
+
+        # texture id -> loaded surface
+        self._textures = {}
+
+        # with or without alpha -> a surface in the pixel format those textures are converted to
+        self._format_templates = {}
+
+        # texture id -> (cache path, future for what _read returns) for textures being read in the background
+        self._pending = {}
+        self._loader = None
+
+    def get_group(self, group):
+        """get the ids of the textures in a group of the manifest, in order"""
+        return self._groups[group]
+
+    def get_texture(self, texture_id):
+        """get a texture by id, loading it if it hasn't been loaded yet"""
+
+        texture = self._textures.get(texture_id)
+
+        if texture is None:
+            pending = self._pending.pop(texture_id, None)
+
+            if pending:
+                cache_path, loading = pending
+                loaded = loading.result()
+
+                # nothing else is being read, so don't keep the threads around
+                if not self._pending:
+                    self.close()
+            else:
+                cache_path = self._get_cache_path(texture_id)
+                loaded = self._read(texture_id, cache_path)
+
+            texture = self._textures[texture_id] = self._convert(texture_id, cache_path, loaded)
+
+        return texture
+
+    def get_textures(self, texture_ids):
+        """get a list of textures by id, reading any that haven't been loaded yet from disk in parallel"""
+
+        self.preload(texture_ids)
+        return [self.get_texture(texture_id) for texture_id in texture_ids]
+
+    def preload(self, texture_ids):
+        """start reading textures that haven't been loaded yet on background threads and return straight away.
+        get_texture waits for them to finish."""
+
+        missing_ids = [texture_id for texture_id in dict.fromkeys(texture_ids)
+                       if texture_id not in self._textures and texture_id not in self._pending]
+
+        # reading files and decoding PNGs lets go of the GIL so they can overlap. Anything to do with the
+        # display's pixel format is only done back on the main thread, as that is not safe to do on others.
+        if not missing_ids or self._load_threads < 2:
+            return
+
+        if self._loader is None:
+            self._loader = ThreadPoolExecutor(self._load_threads, 'asset-loader')
+
+        for texture_id in missing_ids:
+            cache_path = self._get_cache_path(texture_id)
+            self._pending[texture_id] = (cache_path, self._loader.submit(self._read, texture_id, cache_path))
+
+    def close(self):
+        """Wait for any textures being read in the background and stop the threads reading them.
+        Textures already preloaded can still be got, and preloading again starts new threads.
+
+        Call this before forking, as threads don't survive being forked.
+        """
+
+        if self._loader:
+            self._loader.shutdown()
+            self._loader = None
+
+    def _get_path(self, texture_id):
+        return os.path.join(self._asset_folder, self._entries[texture_id]['path'])
+
+    def _has_alpha(self, texture_id):
+        return self._entries[texture_id].get('alpha', False)
+
+    def _get_format_template(self, alpha):
+        """get a tiny surface in the pixel format textures with or without alpha are converted to"""
+
+        template = self._format_templates.get(alpha)
+
+        if template is None:
+            if alpha:
+                template = pygame.Surface((1, 1), pygame.SRCALPHA).convert_alpha()
+            else:
+                template = pygame.Surface((1, 1)).convert()
+
+            self._format_templates[alpha] = template
+
+        return template
+
+    def _get_cache_path(self, texture_id):
+        if not self._cache_folder:
+            return None
+
+        # the pixels saved depend on the texture file and on the display's pixel format, so name the file after both
+        path = self._get_path(texture_id)
+        file_stat = os.stat(path)
+        template = self._get_format_template(self._has_alpha(texture_id))
+        key = repr((path, file_stat.st_mtime_ns, file_stat.st_size,
+                    template.get_bitsize(), template.get_masks(), template.get_shifts()))
+
+        return os.path.join(self._cache_folder, f'{texture_id}-{hashlib.sha1(key.encode()).hexdigest()[:16]}.npy')
+
+    def _read(self, texture_id, cache_path):
+        """read a texture's cached pixels if it has any, otherwise decode its file. Safe to call from any thread"""
+
+        if cache_path and os.path.exists(cache_path):
+            try:
+                return np.load(cache_path, mmap_mode='r')
+            except (OSError, ValueError):
+                # a damaged cache file would fail every run from now on, so get rid of it and use the image instead
+                try:
+                    os.remove(cache_path)
+                except OSError:
+                    pass
+
+        return pygame.image.load(self._get_path(texture_id))
+
+    def _convert(self, texture_id, cache_path, loaded):
+        """turn what _read returned into a surface in the display's pixel format, caching its pixels if it is new"""
+
+        alpha = self._has_alpha(texture_id)
+
+        if isinstance(loaded, np.ndarray):
+            # cached pixels are already in the display's format, so they can be copied straight in
+            template = self._get_format_template(alpha)
+            texture = pygame.Surface(loaded.shape, template.get_flags(), template)
+            pygame.surfarray.pixels2d(texture)[:] = loaded
+            return texture
+
+        texture = loaded.convert_alpha() if alpha else loaded.convert()
+
+        if cache_path:
+            self._save_to_cache(cache_path, texture)
+
+        return texture
 
-def get_textures(texture_folder):
-    """A simple way to load game textures from a folder"""
+    def _save_to_cache(self, cache_path, texture):
+        # the cache only makes later runs faster, so if it can't be written just carry on without it
+        try:
+            os.makedirs(self._cache_folder, exist_ok=True)
 
-    textures = []
+            # write to a temporary file and move it into place in one go, so a run stopped part way through
+            # writing never leaves a half written file behind for the next run to load
+            file, temporary_path = tempfile.mkstemp(suffix='.npy', dir=self._cache_folder)
 
-    for file in os.listdir(texture_folder):
-        if file.endswith(".png"):
-            path = os.path.join(texture_folder, file)
-            texture = pygame.image.load(path)
-            textures.append(texture)
+            try:
+                with os.fdopen(file, 'wb') as cache_file:
+                    np.save(cache_file, pygame.surfarray.array2d(texture))
 
-    return textures
+                os.replace(temporary_path, cache_path)
+            except BaseException:
+                os.remove(temporary_path)
+                raise
+        except OSError:
+            pass
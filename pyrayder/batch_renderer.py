@@ -0,0 +1,221 @@
+"""This module renders frames for many camera poses at once, without a window, and streams them to disk.
+
+A pose is a row of six floats: position x, position y, direction x, direction y, camera plane x, camera plane y.
+
+    game_level = level.load_level()
+    renderer = BatchRenderer(game_level)
+    poses = get_poses(benchmark.get_camera_path(game_level, 100))
+    frames = renderer.render(poses)
+    write_frames(renderer, poses, 'frames')
+    for chunk in read_frames('frames'):
+        chunk['frames'], chunk['perceptual_wall_distance'], ...
+"""
+
+import json
+import os
+
+import numpy as np
+import pygame
+from pygame.math import Vector2
+
+import asset_loader
+import colors
+import framebuffer
+import settings
+from floor_caster import FloorCaster
+from player import Player
+from plotter import Plotter
+from ray_caster import RayCaster, RayHits
+from sky import Sky
+
+# what each per-column buffer is stored as on disk, small enough to keep millions of frames without losing anything
+HIT_DTYPES = {
+    'perceptual_wall_distance': np.float32,
+    'side': np.int8,
+    'map_x': np.int32,
+    'map_y': np.int32,
+    'texture_index': np.int16,
+    'texture_x': np.int16,
+}
+
+INDEX_FILE = 'index.json'
+
+
+def get_poses(players):
+    """get an (n, 6) array of poses from a list of players"""
+
+    return np.array([(*player.position, *player.direction, *player.camera_plane) for player in players],
+                    dtype=np.float64).reshape(-1, 6)
+
+
+def _get_player(pose):
+    return Player(Vector2(pose[0], pose[1]), Vector2(pose[2], pose[3]), Vector2(pose[4], pose[5]))
+
+
+class BatchRenderer:
+    """This type draws frames for a whole batch of poses at once, as arrays rather than on a screen.
+
+    The map, the textures and the per-column camera tables are set up once and shared by every frame.
+    The rays of every column of every pose in a batch are cast together in one RayCaster call, so the cost
+    of stepping through the map is paid once per batch rather than once per frame. The floor, sky and walls
+    are then drawn into each frame with the same array code the game uses, so the pixels match the game's.
+    Sprites are not drawn, as they are blitted one at a time by Renderer.
+
+    pygame needs a display to convert textures to, so one is made if there isn't one already.
+    Set SDL_VIDEODRIVER to dummy to run without a window.
+    """
+
+    def __init__(self, game_level, screen_width=settings.SCREEN_WIDTH, screen_height=settings.SCREEN_HEIGHT,
+                 assets=None):
+        if pygame.display.get_surface() is None:
+            pygame.display.set_mode((screen_width, screen_height))
+
+        self.level = game_level
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+
+        # the pixel format of the frames, see get_rgb
+        self._format = pygame.Surface((1, 1)).convert()
+
+        assets = assets or asset_loader.AssetManager()
+
+        self.WALL_TEXTURE_ATLAS = asset_loader.get_texture_atlas(assets.get_textures(assets.get_group('walls')))
+
+        self.plotter = Plotter(screen_width, screen_height)
+        self.ray_caster = RayCaster(game_level, screen_width)
+        self.sky = Sky(assets.get_texture(settings.SKY_TEXTURE), screen_width, screen_height / 2)
+
+        self.floor_caster = None
+
+        if settings.FLOOR_CASTING:
+            floor_texture_atlas = asset_loader.get_texture_atlas(
+                assets.get_textures([settings.FLOOR_TEXTURE, settings.CEILING_TEXTURE]))
+            self.floor_caster = FloorCaster(game_level, floor_texture_atlas, self.plotter, screen_height)
+        else:
+            self._floor_color = self._format.map_rgb(colors.FLOOR_GRAY)
+
+    def cast(self, poses):
+        """cast every column's ray for every pose at once and return the walls they hit as RayHits of (pose, column)
+        arrays, the same as RayCaster.cast returns for each pose"""
+
+        poses = np.asarray(poses, dtype=np.float64).reshape(-1, 6)
+        shape = (len(poses), self.screen_width)
+
+        # every column's ray is the direction plus a bit of the camera plane, see Plotter.get_rays
+        camera_x = self.plotter.camera_x
+        ray_x = poses[:, 2:3] + poses[:, 4:5] * camera_x
+        ray_y = poses[:, 3:4] + poses[:, 5:6] * camera_x
+        origin_x = np.broadcast_to(poses[:, 0:1], shape)
+        origin_y = np.broadcast_to(poses[:, 1:2], shape)
+
+        hits = self.ray_caster.cast_rays(origin_x.ravel(), origin_y.ravel(), ray_x.ravel(), ray_y.ravel(),
+                                         self.WALL_TEXTURE_ATLAS.texture_width)
+
+        return RayHits(*(values.reshape(shape) for values in hits))
+
+    def render(self, poses, out=None, hits=None):
+        """Draw a frame for every pose and return them as a (pose, y, x) array of mapped pixels, see get_rgb.
+
+        out is an array to draw into, such as part of a memory mapped file, so frames never have to be copied.
+        Pass hits if the poses' rays have already been cast, see cast.
+        """
+
+        poses = np.asarray(poses, dtype=np.float64).reshape(-1, 6)
+
+        if out is None:
+            out = np.empty((len(poses), self.screen_height, self.screen_width), dtype=np.uint32)
+
+        if hits is None:
+            hits = self.cast(poses)
+
+        shades = self.WALL_TEXTURE_ATLAS.get_shades(hits.side, hits.perceptual_wall_distance)
+        half_height = self.screen_height // 2
+
+        for frame_number, pose in enumerate(poses):
+            player = _get_player(pose)
+
+            # everything draws into (x, y) arrays, like the ones from surfarray.pixels2d
+            pixels = out[frame_number].T
+
+            self.sky.draw_pixels(pixels, player)
+
+            if self.floor_caster:
+                self.floor_caster.draw(pixels, player)
+            else:
+                pixels[:, half_height:] = self._floor_color
+
+            frame_hits = RayHits(*(values[frame_number] for values in hits))
+            framebuffer.draw_wall_columns(pixels, frame_hits, self.WALL_TEXTURE_ATLAS.pixels, shades[frame_number])
+
+        return out
+
+    def get_rgb(self, frames):
+        """turn an array of mapped pixels from render into an array of the same shape with an extra axis of red, green
+        and blue bytes"""
+
+        red_shift, green_shift, blue_shift, _ = self._format.get_shifts()
+
+        return np.stack([(frames >> shift).astype(np.uint8) for shift in (red_shift, green_shift, blue_shift)], axis=-1)
+
+
+def write_frames(batch_renderer, poses, folder, chunk_size=1024, batch_size=32, frames=True):
+    """Render every pose and save the frames and per-column buffers to a folder, a chunk of poses at a time.
+
+    Each chunk is a set of .npy files that are filled in place through memory maps, so memory use stays the
+    same however many poses there are. Pass frames=False to only save the per-column buffers.
+    index.json lists the chunks, see read_frames.
+    """
+
+    os.makedirs(folder, exist_ok=True)
+    poses = np.asarray(poses, dtype=np.float64).reshape(-1, 6)
+
+    chunks = []
+
+    for chunk_start in range(0, len(poses), chunk_size):
+        chunk_poses = poses[chunk_start:chunk_start + chunk_size]
+        chunk_name = f'chunk_{len(chunks):06d}'
+        column_shape = (len(chunk_poses), batch_renderer.screen_width)
+
+        def open_array(name, shape, dtype):
+            path = os.path.join(folder, f'{chunk_name}_{name}.npy')
+            return np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+
+        arrays = {name: open_array(name, column_shape, dtype) for name, dtype in HIT_DTYPES.items()}
+        open_array('poses', chunk_poses.shape, np.float64)[:] = chunk_poses
+
+        if frames:
+            arrays['frames'] = open_array(
+                'frames', (len(chunk_poses), batch_renderer.screen_height, batch_renderer.screen_width), np.uint32)
+
+        for batch_start in range(0, len(chunk_poses), batch_size):
+            batch = slice(batch_start, batch_start + batch_size)
+            hits = batch_renderer.cast(chunk_poses[batch])
+
+            for name, values in hits._asdict().items():
+                arrays[name][batch] = values
+
+            if frames:
+                batch_renderer.render(chunk_poses[batch], arrays['frames'][batch], hits)
+
+        for array in arrays.values():
+            array.flush()
+
+        del arrays
+        chunks.append({'name': chunk_name, 'poses': len(chunk_poses)})
+
+    index = {'screen_width': batch_renderer.screen_width, 'screen_height': batch_renderer.screen_height,
+             'arrays': ['poses', *HIT_DTYPES, *(['frames'] if frames else [])], 'chunks': chunks}
+
+    with open(os.path.join(folder, INDEX_FILE), 'w') as file:
+        json.dump(index, file, indent=2)
+
+
+def read_frames(folder):
+    """yield every chunk saved by write_frames as a dictionary of read only memory mapped arrays, in order"""
+
+    with open(os.path.join(folder, INDEX_FILE)) as file:
+        index = json.load(file)
+
+    for chunk in index['chunks']:
+        yield {name: np.load(os.path.join(folder, f'{chunk["name"]}_{name}.npy'), mmap_mode='r')
+               for name in index['arrays']}
@@ -0,0 +1,214 @@
+"""This module renders scripted camera paths without a window to measure how fast the renderer is"""
+
+import os
+import time
+import tracemalloc
+
+import numpy as np
+import pygame
+from pygame.math import Vector2
+
+import level
+import settings
+from frame_pipeline import FramePipeline
+from player import Player
+from profiler import FrameProfiler
+from renderer import Renderer
+
+
+def get_camera_path(game_level, frame_count):
+    """get a list of players that visit every empty square of the map, turning a little every frame.
+
+    The camera always stands in the middle of a square without a wall so it never ends up inside one.
+    """
+
+    # look for walls rather than empty squares, so the camera can't start in a wall whatever else is flagged
+    empty_squares = list(zip(*np.nonzero((game_level.flag_grid & level.WALL) == 0)))
+
+    # turn just over once for every square so each frame looks at something new.
+    degrees_per_frame = 360 * (len(empty_squares) + 1) / frame_count
+
+    path = []
+
+    for frame in range(frame_count):
+        x, y = empty_squares[frame * len(empty_squares) // frame_count]
+
+        player = Player(Vector2(float(x) + 0.5, float(y) + 0.5),
+                        Vector2(settings.PLAYER_START_DIRECTION), Vector2(settings.PLAYER_START_CAMERA_PLANE))
+        player.rotate(frame * degrees_per_frame)
+        path.append(player)
+
+    return path
+
+
+def _get_reference_path(folder, frame):
+    return os.path.join(folder, f'frame_{frame:04d}.png')
+
+
+def _draw_frames(renderer, path, pipeline=None):
+    """draw every frame of the path in order, yielding the number of each frame once it is on the screen surface.
+
+    With a pipeline, each frame's rays are cast on a thread while the frame before it is drawn.
+    """
+
+    if pipeline is None:
+        for frame, player in enumerate(path):
+            renderer.draw(player, settings.TARGET_FPS)
+            yield frame
+
+        return
+
+    frame = 0
+
+    for player in path:
+        if pipeline.render(player, settings.TARGET_FPS):
+            yield frame
+            frame += 1
+
+    while pipeline.draw_next(settings.TARGET_FPS):
+        yield frame
+        frame += 1
+
+
+def _time_frames(renderer, path, pipeline):
+    frames = _draw_frames(renderer, path, pipeline)
+
+    # time from the end of one frame to the end of the next, as with a pipeline that is the time one frame takes
+    while True:
+        with renderer.profiler.stage('frame'):
+            if next(frames, None) is None:
+                break
+
+
+def _measure_allocations(renderer, path):
+    """get the average peak of memory allocated while drawing a frame, in bytes"""
+
+    tracemalloc.start()
+    peaks = []
+
+    for player in path:
+        tracemalloc.reset_peak()
+        current_before, _ = tracemalloc.get_traced_memory()
+
+        renderer.draw(player, settings.TARGET_FPS)
+
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - current_before)
+
+    tracemalloc.stop()
+
+    return sum(peaks) / len(peaks)
+
+
+def _check_reference_frames(renderer, path, folder, pipeline):
+    """draw every frame of the path and return the numbers of the frames that don't match the saved reference"""
+
+    mismatched_frames = []
+
+    for frame in _draw_frames(renderer, path, pipeline):
+        reference = pygame.image.load(_get_reference_path(folder, frame))
+
+        if not np.array_equal(pygame.surfarray.array3d(reference), pygame.surfarray.array3d(renderer.SCREEN)):
+            mismatched_frames.append(frame)
+
+    return mismatched_frames
+
+
+def run(game_level, frame_count=300, dump_reference=None, check_reference=None, pipelined=False, start_time=None):
+    """render a scripted camera path offscreen and print per stage timings. Returns an exit code for the program.
+
+    dump_reference is a folder to save every frame into, so future changes can be checked against them
+    pixel for pixel by passing the same folder as check_reference.
+    pipelined draws the frames through a FramePipeline, casting the rays for each frame during the one before.
+    start_time is the time.perf_counter() the program started at, to report how long it took to get to the first frame.
+    """
+
+    # how long each step of starting up took, in seconds
+    startup_seconds = {}
+    step_start = time.perf_counter()
+
+    if start_time is not None:
+        startup_seconds['imports and level'] = step_start - start_time
+
+    def end_startup_step(name):
+        nonlocal step_start
+        now = time.perf_counter()
+        startup_seconds[name] = now - step_start
+        step_start = now
+
+    # the dummy video driver lets SDL run without a display, so this works on headless machines.
+    # It must be set before the renderer opens its window.
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.init()
+    pygame.font.init()
+    end_startup_step('pygame')
+
+    path = get_camera_path(game_level, frame_count)
+
+    profiler = FrameProfiler(window=frame_count)
+    renderer = Renderer(game_level, profiler)
+    pipeline = FramePipeline(renderer) if pipelined else None
+    end_startup_step('renderer')
+
+    try:
+        # draw a frame first so one off costs like filling caches don't count against the first frame.
+        renderer.draw(path[0], settings.TARGET_FPS)
+        renderer.invalidate()
+        end_startup_step('first frame')
+
+        # time every stage of every frame on the path. The profiler is only enabled while we do this,
+        # as the timings it shows on screen would stop frames matching their reference frames.
+        profiler.enabled = True
+
+        _time_frames(renderer, path, pipeline)
+
+        profiler.enabled = False
+
+        if dump_reference:
+            os.makedirs(dump_reference, exist_ok=True)
+
+            for frame, player in enumerate(path):
+                renderer.draw(player, settings.TARGET_FPS)
+                pygame.image.save(renderer.SCREEN, _get_reference_path(dump_reference, frame))
+
+        mismatched_frames = []
+
+        if check_reference:
+            mismatched_frames = _check_reference_frames(renderer, path, check_reference, pipeline)
+
+        allocated_bytes = _measure_allocations(renderer, path)
+
+    finally:
+        if pipeline:
+            pipeline.close()
+
+        renderer.close()
+        pygame.quit()
+
+    summary = profiler.get_summary()
+    frame_summary = summary.pop('frame')
+
+    print(f'frames: {frame_count} at {settings.SCREEN_WIDTH}x{settings.SCREEN_HEIGHT}'
+          f' drawn at {renderer.render_width}x{renderer.render_height}')
+    print(f'fps: {1000 / frame_summary["mean_ms"]:.1f}')
+    print(f'frame time p50: {frame_summary["p50_ms"]:.2f}ms p99: {frame_summary["p99_ms"]:.2f}ms')
+
+    for name, stage_summary in summary.items():
+        print(f'  {name}: {stage_summary["mean_ms"]:.2f}ms')
+
+    print(f'allocated per frame: {allocated_bytes / 1024:.1f}KiB')
+
+    startup_steps = ', '.join(f'{name} {seconds * 1000:.1f}ms' for name, seconds in startup_seconds.items())
+    print(f'start up: {sum(startup_seconds.values()) * 1000:.1f}ms to the first frame ({startup_steps})')
+
+    if dump_reference:
+        print(f'saved {frame_count} reference frames to {dump_reference}')
+
+    if check_reference:
+        if mismatched_frames:
+            print(f'{len(mismatched_frames)} frames do not match the reference frames: {mismatched_frames}')
+            return 1
+
+        print('all frames match the reference frames')
+
+    return 0
@@ -0,0 +1,69 @@
+"""This module contains a least recently used cache for scaled wall columns"""
+
+from collections import OrderedDict
+
+
+class ColumnCache:
+    """This type keeps scaled wall column surfaces around so they can be drawn again without rescaling.
+
+    Columns are keyed by (texture index, shade, texture x, height). When the cache goes over its memory cap,
+    the columns that were used least recently are thrown away first.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+
+        # how many lookups found a column (hits) or had to scale a new one (misses), useful for tuning max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        # an ordered dict remembers the order keys were added in, so we move keys to the end
+        # whenever they are used and the least recently used key is always first.
+        self._columns = OrderedDict()
+
+    def _get_size_in_bytes(self, column):
+        return column.get_height() * column.get_width() * column.get_bytesize()
+
+    def get(self, key):
+        """get the column stored for a key, or None if it isn't cached"""
+
+        column = self._columns.get(key)
+
+        if column is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._columns.move_to_end(key)
+
+        return column
+
+    def put(self, key, column):
+        """store a column, evicting the least recently used columns if that takes us over the memory cap"""
+
+        size = self._get_size_in_bytes(column)
+
+        # very tall columns (from walls right in front of the player) would push everything else out, so don't keep them.
+        if size > self.max_bytes:
+            return
+
+        self._columns[key] = column
+        self.used_bytes += size
+
+        while self.used_bytes > self.max_bytes:
+            _, evicted_column = self._columns.popitem(last=False)
+            self.used_bytes -= self._get_size_in_bytes(evicted_column)
+
+    def get_hit_rate(self):
+        """get the share of lookups that were found in the cache, between 0 and 1"""
+
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0
+
+    def clear(self):
+        """throw away every cached column and reset the counters"""
+
+        self._columns.clear()
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
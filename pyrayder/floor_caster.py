@@ -0,0 +1,123 @@
+"""This module contains a type that draws textured floors and ceilings straight into an array of screen pixels"""
+
+import numpy as np
+
+import level
+from side import Side
+
+
+class FloorCaster:
+    """This type draws the floor, and the ceiling over squares that have one, a whole row of pixels at a time.
+
+    Every row of pixels below the middle of the screen shows the floor at one distance from the camera,
+    so the distance of each row is worked out once for the screen size and each row is then just that
+    distance along every column's ray. The rows above the middle show the ceiling at the same distances,
+    so they use the same positions flipped upside down. Squares without a ceiling are left alone so the sky shows.
+
+    Textures must be the same size and a power of two wide and high, so a position in texture pixels
+    can be split into its map square and the pixel within the texture with a shift and a mask.
+    """
+
+    def __init__(self, game_level, texture_atlas, plotter, screen_height, floor_texture=0, ceiling_texture=1):
+        self._flags = game_level.flags
+        self._level_width = game_level.width
+        self._level_height = game_level.height
+        self._texture_atlas = texture_atlas
+        self._plotter = plotter
+
+        texture_width = texture_atlas.texture_width
+        texture_height = texture_atlas.texture_height
+        self._x_shift = texture_width.bit_length() - 1
+        self._y_shift = texture_height.bit_length() - 1
+
+        if texture_width != 1 << self._x_shift or texture_height != 1 << self._y_shift:
+            raise ValueError('floor and ceiling textures must be a power of two wide and high')
+
+        # a row of pixels p rows below the middle of the screen shows the floor at distance height / 2p,
+        # see Plotter.get_object_size_based_on_distance. Measure from the middle of each row.
+        # The middle row of a screen with an odd height sits on the horizon, treat it as half a row below.
+        rows = np.arange(screen_height // 2, screen_height)
+        row_distances = screen_height / (2 * np.maximum(rows + 0.5 - screen_height / 2, 0.5))
+
+        # the map has walls all the way round it, so no floor further away than its diagonal can ever be seen.
+        # Wall heights are rounded down, so the row just past that can still peek out under the furthest walls.
+        visible = row_distances <= np.hypot(game_level.width, game_level.height)
+        visible[:-1] |= visible[1:]
+        rows = rows[visible]
+        row_distances = row_distances[visible]
+
+        # the rows of the screen to draw the floor and ceiling in, if any of them are close enough to be seen
+        self._floor_rows = slice(screen_height, screen_height)
+        self._ceiling_rows = slice(0, 0)
+
+        if rows.size:
+            first_row, last_row = int(rows[0]), int(rows[-1])
+
+            self._floor_rows = slice(first_row, last_row + 1)
+
+            # the ceiling rows are the floor rows flipped over the middle of the screen.
+            # This goes backwards up the screen, so stop just above the last ceiling row (or run off the top)
+            ceiling_stop = screen_height - 2 - last_row
+            self._ceiling_rows = slice(screen_height - 1 - first_row, ceiling_stop if ceiling_stop >= 0 else None, -1)
+
+        self._row_distances = row_distances[:, np.newaxis].astype(np.float32)
+
+        # the textures are sampled from a flat list of pixels, so work out where each row's shade of the floor
+        # and the ceiling starts in it up front. Rows further away can be in a thicker fog shade.
+        shades = texture_atlas.get_shades(np.full(row_distances.shape, Side.TopOrBottom.value), row_distances)
+        texture_size = texture_width * texture_height
+        texture_count = texture_atlas.pixels.shape[1]
+
+        self._texture_pixels = texture_atlas.pixels.ravel()
+        self._floor_offsets = ((shades * texture_count + floor_texture) * texture_size)[:, np.newaxis].astype(np.int32)
+        self._ceiling_offsets = ((shades * texture_count + ceiling_texture) * texture_size)[:, np.newaxis].astype(np.int32)
+
+        # how far each pixel is from the player in texture pixels, which only changes when the player turns
+        self._rays = None
+        self._row_offsets = None
+
+    def _get_row_offsets(self, player):
+        """get how far across the map each pixel of the floor is from the player in x and y, in texture pixels"""
+
+        rays = self._plotter.get_rays(player)
+
+        if rays is not self._rays:
+            ray_x, ray_y, _, _ = rays
+            texture_atlas = self._texture_atlas
+
+            self._row_offsets = (self._row_distances * (ray_x * texture_atlas.texture_width).astype(np.float32),
+                                 self._row_distances * (ray_y * texture_atlas.texture_height).astype(np.float32))
+            self._rays = rays
+
+        return self._row_offsets
+
+    def draw(self, pixels, player):
+        """draw the floor and ceiling into an (x, y) array of mapped pixels, such as the one from surfarray.pixels2d"""
+
+        if not self._row_distances.size:
+            return
+
+        offset_x, offset_y = self._get_row_offsets(player)
+        texture_atlas = self._texture_atlas
+
+        # where every pixel of the floor is in the map, in texture pixels
+        texture_x = (offset_x + np.float32(player.position.x * texture_atlas.texture_width)).astype(np.int32)
+        texture_y = (offset_y + np.float32(player.position.y * texture_atlas.texture_height)).astype(np.int32)
+
+        # which map square each pixel is in. Anything off the map is hidden behind the walls round the edge.
+        map_x = np.clip(texture_x >> self._x_shift, 0, self._level_width - 1)
+        map_y = np.clip(texture_y >> self._y_shift, 0, self._level_height - 1)
+        has_ceiling = self._flags[map_x * self._level_height + map_y] & level.CEILING
+
+        # the pixel within the texture, as an index into the flat texture pixels. Textures are stored [x][y].
+        texture_x &= texture_atlas.texture_width - 1
+        texture_y &= texture_atlas.texture_height - 1
+        texture_x <<= self._y_shift
+        texture_x |= texture_y
+
+        # the screen's pixels are stored row by row
+        frame = pixels.T
+
+        frame[self._floor_rows] = self._texture_pixels.take(texture_x + self._floor_offsets)
+        np.copyto(frame[self._ceiling_rows], self._texture_pixels.take(texture_x + self._ceiling_offsets),
+                  where=has_ceiling.astype(bool))
@@ -0,0 +1,65 @@
+"""This module contains a type that casts the rays for upcoming frames on a thread while the current frame is drawn"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class FramePipeline:
+    """This type overlaps casting the rays for the next frame with drawing and showing the current one.
+
+    Rays are cast with numpy, which lets go of the GIL for most of its work, so a thread can cast the rays for
+    frame N + 1 while the main thread draws frame N into the screen surface and shows it.
+    At most frames_ahead frames are cast ahead of the one being drawn, so what is on screen is never more than
+    frames_ahead frames behind the game. Frames are always drawn in the order they were asked for.
+    """
+
+    def __init__(self, renderer, frames_ahead=1):
+        self._renderer = renderer
+        self._frames_ahead = frames_ahead
+        self._caster = ThreadPoolExecutor(1, 'ray-caster')
+
+        # (player, rays being cast for them) for every frame waiting to be drawn, oldest first
+        self._frames = deque()
+
+        # the last player cast and their rays, so a player that hasn't moved doesn't get their rays cast again
+        self._last_pose = None
+        self._last_hits = None
+
+    def render(self, player, fps):
+        """Start casting the rays for a frame of the player, then draw and show the oldest frame if enough
+        frames are waiting. The player is copied, so it is fine to keep moving them while their rays are cast.
+        Returns True if a frame was drawn.
+        """
+
+        player = player.copy()
+        pose = (tuple(player.position), tuple(player.direction), tuple(player.camera_plane))
+
+        if pose != self._last_pose:
+            self._last_pose = pose
+            self._last_hits = self._caster.submit(self._renderer.cast_walls, player)
+
+        self._frames.append((player, self._last_hits))
+
+        if len(self._frames) > self._frames_ahead:
+            return self.draw_next(fps)
+
+        return False
+
+    def draw_next(self, fps):
+        """draw and show the oldest frame waiting, waiting for its rays if need be. Returns False if there isn't one"""
+
+        if not self._frames:
+            return False
+
+        player, hits = self._frames.popleft()
+
+        self._renderer.draw(player, fps, hits.result())
+        self._renderer.present()
+
+        return True
+
+    def close(self):
+        """stop the ray casting thread, dropping any frames still waiting"""
+
+        self._frames.clear()
+        self._caster.shutdown()
@@ -0,0 +1,76 @@
+"""This module contains functions that draw straight into an array of screen pixels"""
+
+from functools import lru_cache
+
+import numpy as np
+import pygame
+
+import colors
+
+
+def draw_wall_columns(pixels, hits, texture_pixels, shades, first_column=0):
+    """Draw textured wall columns into a pixel array in one go.
+
+    pixels is an (x, y) array of mapped pixels such as the one from pygame.surfarray.pixels2d,
+    hits are the RayHits for the columns to draw, texture_pixels is an (shade, index, x, y) array of
+    wall textures such as TextureAtlas.pixels and shades are the shade to draw each column with.
+    first_column is the x position in pixels of the first hit, so we can draw part of the screen.
+    """
+
+    column_count = len(shades)
+    screen_height = pixels.shape[1]
+    texture_height = texture_pixels.shape[3]
+
+    # gather the shaded texture column each screen column needs in one indexed operation.
+    # flatten the columns row by row so every texture pixel can be picked with a single index.
+    # Rows come first here because that is how the pixels are laid out in the screen's memory.
+    wall_columns = texture_pixels[shades, hits.texture_index, hits.texture_x].T.ravel()
+
+    # Calculate height of lines to draw on screen, see Plotter.get_object_size_based_on_distance
+    line_heights = (screen_height / hits.perceptual_wall_distance).astype(np.int32)
+
+    # calculate the highest pixel of each wall line.
+    # a start of a line can be thought of as half the line up (-y) from the center of the screen in y.
+    draw_start = (screen_height / 2 - line_heights / 2).astype(np.int32)
+
+    # work out how far down its own wall line every pixel in every column is,
+    # and which of those pixels are actually part of a wall.
+    row_in_line = np.arange(screen_height, dtype=np.int32)[:, np.newaxis] - draw_start
+    is_wall = (row_in_line >= 0) & (row_in_line < line_heights)
+
+    # scale the texture to the height of the line by picking the nearest texture row for each pixel.
+    texture_y = ((row_in_line * texture_height) / np.maximum(line_heights, 1)).astype(np.int32)
+    np.clip(texture_y, 0, texture_height - 1, out=texture_y)
+
+    texture_y *= column_count
+    texture_y += np.arange(column_count, dtype=np.int32)
+
+    np.copyto(pixels.T[:, first_column:first_column + column_count],
+              wall_columns.take(texture_y), where=is_wall)
+
+
+@lru_cache(maxsize=None)
+def get_darken_table():
+    """Get what every 0-255 color value becomes when a side of a wall is darkened, as an array of 256 bytes.
+
+    Darkening covers the wall with black at half strength (128 out of 255). SDL's blend doesn't work out to any
+    simple sum, and rounds differently on 24 bit textures than on 32 bit ones, so rather than trying to match it
+    we let SDL darken every value once, on a 24 bit surface like the textures are loaded as.
+    """
+
+    ramp = pygame.Surface((256, 1), 0, 24)
+    pygame.surfarray.pixels3d(ramp)[:] = np.arange(256, dtype=np.uint8)[:, np.newaxis, np.newaxis]
+
+    mask = pygame.Surface(ramp.get_size())
+    mask.fill(colors.BLACK)
+    mask.set_alpha(128)
+    ramp.blit(mask, (0, 0))
+
+    return pygame.surfarray.array3d(ramp)[:, 0, 0].copy()
+
+
+def darken(rgb):
+    """darken an array of red, green and blue bytes in place, such as the one from pygame.surfarray.pixels3d,
+    exactly as much as the sides of walls are darkened"""
+
+    rgb[...] = get_darken_table()[rgb]
@@ -0,0 +1,42 @@
+"""This module contains a type that keeps everything known about the wall in each column of the view"""
+
+import numpy as np
+
+from side import Side
+
+
+class GBuffer:
+    """This type holds one entry per column of the view for the wall that column shows, as arrays.
+
+    Renderer fills it in every time it draws the walls, copying into the same arrays every frame so nothing is
+    allocated and anything holding on to an array always sees the latest frame. Treat the arrays as read only.
+
+    perceptual_wall_distance is how far the wall is in front of the camera, side is which Side of its square
+    was hit, map_x and map_y are the square hit, texture_index and texture_x are the wall texture and the
+    column of it drawn, and normal_x and normal_y point out of the face of the wall that was hit.
+    """
+
+    def __init__(self, width):
+        self.width = width
+
+        # nothing has been drawn yet, so every wall is infinitely far away
+        self.perceptual_wall_distance = np.full(width, np.inf)
+        self.side = np.zeros(width, dtype=np.int8)
+        self.map_x = np.zeros(width, dtype=np.intp)
+        self.map_y = np.zeros(width, dtype=np.intp)
+        self.texture_index = np.zeros(width, dtype=np.intp)
+        self.texture_x = np.zeros(width, dtype=np.intp)
+        self.normal_x = np.zeros(width, dtype=np.int8)
+        self.normal_y = np.zeros(width, dtype=np.int8)
+
+    def update(self, hits, ray_x, ray_y):
+        """copy in the RayHits for every column, and the x and y of the rays that hit them"""
+
+        for field, values in hits._asdict().items():
+            np.copyto(getattr(self, field), values)
+
+        # the face hit points back against the ray, along x for left or right sides and along y for the others
+        hit_left_or_right = hits.side == Side.LeftOrRight.value
+
+        np.copyto(self.normal_x, np.where(ray_x < 0, 1, -1) * hit_left_or_right, casting='unsafe')
+        np.copyto(self.normal_y, np.where(ray_y < 0, 1, -1) * ~hit_left_or_right, casting='unsafe')
@@ -3,6 +3,7 @@
 # and here https://github.com/Mekire/pygame-raycasting-experiment
 
 import math
+from time import perf_counter
 
 import pygame
 from pygame.math import Vector2
@@ -14,27 +15,78 @@ from side import Side
 class Game:
     """primary game engine class"""
 
-    def __init__(self, renderer, player, input_handler):
+    def __init__(self, renderer, player, input_handler, resolution_controller=None, pipeline=None):
         self._renderer = renderer
+        self._profiler = renderer.profiler
         self._player = player
         self._input_handler = input_handler
+
+        # changes the render scale to keep up with the frame rate, see ResolutionController
+        self._resolution_controller = resolution_controller
+
+        # draws frames while the rays for the next one are cast on a thread, see FramePipeline
+        self._pipeline = pipeline
         self._running = True
 
     def run(self):
-        """Run the game with this method"""
-        pygame.init()
+        """Run the game with this method.
 
+        The game world is updated in fixed steps of 1 / UPDATES_PER_SECOND seconds, however long frames take
+        to draw, so the game plays at the same speed on any machine. Each frame runs however many updates
+        fit in the time that has passed, then draws the player part way between the last two updates.
+        pygame's display must already be started, see __main__.
+        """
         clock = pygame.time.Clock()
 
         fps = 0
 
+        update_seconds = 1 / settings.UPDATES_PER_SECOND
+        unsimulated_seconds = 0
+        previous_player = self._player.copy()
+        last_time = perf_counter()
+
         while self._running:
 
-            self._running = self._input_handler.handle_input(self._player)
-            self._renderer.render(self._player, fps)
+            now = perf_counter()
+            unsimulated_seconds += min(now - last_time, settings.MAX_FRAME_SECONDS)
+            last_time = now
+
+            with self._profiler.stage('update'):
+                while self._running and unsimulated_seconds >= update_seconds:
+                    previous_player = self._player.copy()
+                    self._running = self._input_handler.handle_input(self._player, update_seconds)
+                    unsimulated_seconds -= update_seconds
+
+            # how far we are from the last update to the next one (we can be further if we have just quit)
+            player = self._player.get_interpolated(previous_player, min(unsimulated_seconds / update_seconds, 1))
+
+            frame_start = perf_counter()
+
+            if self._pipeline:
+                with self._profiler.stage('render'):
+                    self._pipeline.render(player, fps)
+            else:
+                with self._profiler.stage('draw'):
+                    self._renderer.draw(player, fps)
+
+                with self._profiler.stage('present'):
+                    self._renderer.present()
+
+            if self._resolution_controller:
+                self._update_render_scale((perf_counter() - frame_start) * 1000)
 
             # delay until next frame.
             clock.tick(settings.TARGET_FPS)
             fps = math.floor(clock.get_fps())
 
+        if self._pipeline:
+            self._pipeline.close()
+
+        self._renderer.close()
         pygame.quit()
+
+    def _update_render_scale(self, frame_milliseconds):
+        render_scale = self._resolution_controller.update(frame_milliseconds)
+
+        if render_scale is not None:
+            self._renderer.set_render_scale(render_scale)
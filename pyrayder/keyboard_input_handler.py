@@ -1,15 +1,25 @@
 """This module contains the keyboard input handler type"""
 
-import math
+import numpy as np
 import pygame
+from pygame.math import Vector2
+
 import settings
+from movement import Mover
 
 
 class KeyboardInputHandler:
     """A basic keyboard input handler class"""
 
-    def handle_input(self, player):
-        """This function handles control input for this program. Returns false if exit button is pressed"""
+    def __init__(self, game_level):
+        self._mover = Mover(game_level, settings.COLLISION_RADIUS)
+
+    def handle_input(self, player, seconds):
+        """This function handles control input for this program, moving the player as far as they can go in
+        the given number of seconds. Returns false if exit button is pressed"""
+
+        move_distance = settings.MOVE_SPEED * seconds
+        rotation = settings.ROTATION_SPEED * seconds
 
         for event in pygame.event.get():
             # quit if user presses exit
@@ -21,37 +31,28 @@ class KeyboardInputHandler:
         if pressed[pygame.K_ESCAPE]:
             return False
 
-        # handle movement
+        # handle movement, adding up everything the keys want to do before checking for walls
+        move = Vector2()
 
-            #forward and backward
+        # forward and backward
         if pressed[pygame.K_UP]:
-
-            # very basic collision checking by figuring out where will be IF we move forward
-            # and checking to see if that position is inside a map square with something in it we don't want to walk through.
-            # We have to cut out the decimal part of the result with math.floor because the 2D map array is accessed by integer/whole number index.
-            new_position = player.position + player.direction
-            x = math.floor(new_position.x)
-            y = math.floor(new_position.y)
-
-            if settings.MAP[x][y] < 1:
-                player.position += player.direction * settings.MOVE_SPEED
+            move += player.direction
 
         if pressed[pygame.K_DOWN]:
-
-            # same basic collision check as above, just in reverse because we are trying to move backwards.
-            new_position = player.position - player.direction
-            x = math.floor(new_position.x)
-            y = math.floor(new_position.y)
-
-            if settings.MAP[x][y] < 1:
-                player.position -= player.direction * settings.MOVE_SPEED
+            move -= player.direction
 
         # strafe left and right
         if pressed[pygame.K_a]:
-            player.position -= player.camera_plane * settings.MOVE_SPEED
+            move -= player.camera_plane
 
         if pressed[pygame.K_d]:
-            player.position += player.camera_plane * settings.MOVE_SPEED
+            move += player.camera_plane
+
+        if move:
+            # the player is moved like any other agent, sliding along walls rather than stopping dead at them
+            position = np.array([player.position], dtype=np.float64)
+            self._mover.move(position, np.array([move * move_distance], dtype=np.float64))
+            player.position = Vector2(*position[0])
 
         # rotate left and right
         # note, to rotate a vector a by an angle to become vector r(a):
@@ -61,9 +62,9 @@ class KeyboardInputHandler:
         # See http://mathworld.wolfram.com/images/eps-gif/RotationMatrixAxes_1000.gif for more a better explanation for the rotating the vector (1,1)
 
         if pressed[pygame.K_LEFT]:
-            player.rotate(settings.ROTATION_SPEED)
+            player.rotate(rotation)
 
         if pressed[pygame.K_RIGHT]:
-            player.rotate(-settings.ROTATION_SPEED)
+            player.rotate(-rotation)
 
         return True
@@ -0,0 +1,212 @@
+"""This module contains the level type, which stores a map as flat arrays, and loaders for level files.
+
+Levels can be loaded from two kinds of file:
+
+- text (.txt): one row of whitespace separated map values per line, laid out like settings.MAP
+  (the top line is the top of the map).
+- binary (.lvl): a small header followed by the map values and their flags, one byte per square each.
+  These are memory mapped rather than read in, so even huge levels open instantly. Make them with Level.save.
+"""
+
+import struct
+from functools import cached_property
+
+import numpy as np
+
+import settings
+
+# flags describing what is in each map square, so the renderer never has to work it out from map values
+WALL = 1
+SPRITE = 2
+EMPTY = 4
+CEILING = 8  # the square has a ceiling over it instead of open sky
+
+# magic, version, width, height
+_HEADER = struct.Struct('<4sHII')
+_MAGIC = b'PYRL'
+_VERSION = 1
+
+
+def _get_flag_table():
+    """get a table that turns any map value (0-255) into its flags, see settings.MAP"""
+
+    table = np.zeros(256, dtype=np.uint8)
+    table[0] = EMPTY
+    table[1:10] = WALL
+    table[10] = EMPTY | CEILING
+    table[11:20] = SPRITE
+
+    return table
+
+
+_FLAG_TABLE = _get_flag_table()
+
+# distances are stored a byte per square, so squares further than this from a wall are just this far
+MAX_WALL_DISTANCE = 255
+
+
+def _spread_distances(distances):
+    """Sweep along the first axis of a 2D array of distances, making each square at most one more than
+    the nearest of the three squares behind it. This finds every wall in a 90 degree cone behind each square.
+    """
+
+    for row in range(1, len(distances)):
+        previous = distances[row - 1]
+
+        nearest = previous.copy()
+        np.minimum(nearest[1:], previous[:-1], out=nearest[1:])
+        np.minimum(nearest[:-1], previous[1:], out=nearest[:-1])
+        nearest += 1
+
+        np.minimum(distances[row], nearest, out=distances[row])
+
+
+def get_wall_distances(flag_grid):
+    """Get how many squares away the nearest wall is for every square of a flag grid, measured in king's moves
+    (the larger of the x and y distances). Walls are 0 away and the squares next to them are 1.
+
+    This is worked out exactly by sweeping the whole map in all four directions.
+    """
+
+    width, height = flag_grid.shape
+
+    distances = np.where(flag_grid & WALL, 0, width + height).astype(np.int32)
+
+    # sweep forwards and backwards in x, then in y, so every square sees walls in every direction
+    for view in (distances, distances[::-1], distances.T, distances.T[::-1]):
+        _spread_distances(view)
+
+    return np.minimum(distances, MAX_WALL_DISTANCE).astype(np.uint8)
+
+
+class Level:
+    """This type stores a map as flat, contiguous arrays of map values and flags.
+
+    Square (x, y) is at index x * height + y of both arrays, so looking up a square is a single flat index.
+    The squares around the edge of the map are always flagged as walls so rays can never leave the map.
+    wall_distances says how far each square is from the nearest wall, so rays can skip across open space.
+    """
+
+    def __init__(self, tiles, flags, width, height):
+        self.tiles = tiles
+        self.flags = flags
+        self.width = width
+        self.height = height
+
+        # the file the level was loaded from, if it was, so things worked out from it can be saved next to it
+        self.path = None
+
+    @classmethod
+    def from_grid(cls, grid):
+        """make a level from a map indexed as grid[x][y], such as settings.MAP"""
+
+        tiles = np.ascontiguousarray(grid, dtype=np.uint8)
+        width, height = tiles.shape
+
+        flags = _FLAG_TABLE[tiles]
+
+        # put a wall all the way round the map. Walls are solid, so nothing else in those squares counts.
+        flags[[0, -1], :] = WALL
+        flags[:, [0, -1]] = WALL
+
+        return cls(tiles.ravel(), flags.ravel(), width, height)
+
+    @classmethod
+    def load(cls, path):
+        """load a level from a text (.txt) or binary (.lvl) level file"""
+
+        if path.endswith('.lvl'):
+            game_level = cls._load_binary(path)
+        else:
+            game_level = cls._load_text(path)
+
+        game_level.path = path
+        return game_level
+
+    @classmethod
+    def _load_text(cls, path):
+        with open(path) as file:
+            rows = [line.split() for line in file if line.strip()]
+
+        # flip the rows over and turn them on their side so they are indexed [x][y] with +y up, just like settings.MAP
+        return cls.from_grid(np.array(rows, dtype=np.uint8)[::-1].T)
+
+    @classmethod
+    def _load_binary(cls, path):
+        with open(path, 'rb') as file:
+            magic, version, width, height = _HEADER.unpack(file.read(_HEADER.size))
+
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f'{path} is not a version {_VERSION} level file')
+
+        size = width * height
+        tiles = np.memmap(path, dtype=np.uint8, mode='r', offset=_HEADER.size, shape=(size,))
+        flags = np.memmap(path, dtype=np.uint8, mode='r', offset=_HEADER.size + size, shape=(size,))
+
+        return cls(tiles, flags, width, height)
+
+    def save(self, path):
+        """save the level as a binary level file that can be memory mapped by Level.load"""
+
+        with open(path, 'wb') as file:
+            file.write(_HEADER.pack(_MAGIC, _VERSION, self.width, self.height))
+            file.write(np.ascontiguousarray(self.tiles).tobytes())
+            file.write(np.ascontiguousarray(self.flags).tobytes())
+
+    @cached_property
+    def wall_distances(self):
+        """how many squares away the nearest wall is for every square, stored flat like the flags.
+
+        Every square less than this many squares away in both x and y is open, see get_wall_distances.
+        This is worked out the first time it is needed, as it takes a while on very big levels.
+        """
+        return get_wall_distances(self.flag_grid).ravel()
+
+    @property
+    def grid(self):
+        """the map values as a 2D array indexed [x, y], for code that wants to think in squares"""
+        return self.tiles.reshape(self.width, self.height)
+
+    @property
+    def flag_grid(self):
+        """the flags as a 2D array indexed [x, y]"""
+        return self.flags.reshape(self.width, self.height)
+
+    def get_tile(self, x, y):
+        """get the map value of square (x, y)"""
+        return self.tiles[x * self.height + y]
+
+    def get_flags(self, x, y):
+        """get the flags of square (x, y)"""
+        return self.flags[x * self.height + y]
+
+
+def generate_level(width, height, wall_fraction=0.1, seed=0):
+    """make a level of the given size with walls and sprites scattered at random, for testing and benchmarking.
+    The same arguments always make the same level."""
+
+    random = np.random.default_rng(seed)
+
+    # about wall_fraction of the squares are walls with random textures, and a few of the rest are sprites
+    grid = np.zeros((width, height), dtype=np.uint8)
+    squares = random.random((width, height))
+    walls = squares < wall_fraction
+    sprites = squares > 0.995
+
+    grid[walls] = random.integers(1, 9, np.count_nonzero(walls))
+    grid[sprites] = random.integers(11, 13, np.count_nonzero(sprites))
+
+    # put a wall all the way round the map
+    grid[[0, -1], :] = 1
+    grid[:, [0, -1]] = 1
+
+    return Level.from_grid(grid)
+
+
+def load_level(path=None):
+    """load a level file, or the level in settings.MAP if there isn't one"""
+
+    if path:
+        return Level.load(path)
+
+    return Level.from_grid(settings.MAP)
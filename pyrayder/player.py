@@ -2,6 +2,8 @@
 
 import math
 
+from pygame.math import Vector2
+
 
 class Player:
     """A basic player class"""
@@ -17,6 +19,26 @@ class Player:
          self.direction = self.direction.rotate(angle)
          self.camera_plane = self.camera_plane.rotate(angle)
 
+    def copy(self):
+        """Get a copy of the player that won't change when this player moves"""
+        return Player(Vector2(self.position), Vector2(self.direction), Vector2(self.camera_plane))
+
+    def get_interpolated(self, previous, amount):
+        """Get a player part way between a previous copy of this player and where this player is now.
+           An amount of 0 is where the previous player was and 1 is where this player is."""
+
+        position = previous.position.lerp(self.position, amount)
+        direction = self.direction
+        camera_plane = self.camera_plane
+
+        # turn rather than sliding in a straight line, so the direction and camera plane keep their lengths.
+        # If the player hasn't turned we use their direction as it is, so standing still always gives exactly the same player.
+        if previous.direction != self.direction:
+            direction = previous.direction.slerp(self.direction, amount)
+            camera_plane = previous.camera_plane.slerp(self.camera_plane, amount)
+
+        return Player(position, direction, camera_plane)
+
     def get_rotation(self):
         """Get the current rotation of the player in radians"""
         return math.atan2(self.direction.y, self.direction.x)
@@ -1,5 +1,6 @@
 """This module contains a type to store calculate distances between the player and walls/objects"""
 
+import numpy as np
 from pygame.math import Vector2
 
 import settings
@@ -9,6 +10,20 @@ from side import Side
 class Plotter:
     """This type calculates sizes, distances and directions of in game objects in relation to the player"""
 
+    def __init__(self, screen_width=settings.SCREEN_WIDTH, screen_height=settings.SCREEN_HEIGHT):
+        # the size of the view being drawn, which is smaller than the screen when drawing at a lower resolution
+        self._screen_width = screen_width
+        self._screen_height = screen_height
+
+        # x-coordinate along camera plane for each column, from -1 through 0 and on to 1.
+        # This only depends on the screen width so we work it out once up front, as an array and as a list
+        # because plain python lists are much faster to index one item at a time.
+        self.camera_x = (2 * (np.arange(screen_width) / screen_width)) - 1
+        self._camera_x_list = self.camera_x.tolist()
+
+        # (camera rotation, ray direction and distance delta of every column) for the last rotation, see get_rays
+        self._rays = (None, None)
+
     def _avoid_zero(self, value):
         """use this function to avoid zero if we risk a divide by zero expression."""
         if value == 0:
@@ -20,7 +35,7 @@ class Plotter:
         """Returns a value between 1 (100%) and 0 (0%) describing how much of the vertical screen an object 
            should consume based on its distance from the player"""
 
-        size = int(settings.SCREEN_HEIGHT /
+        size = int(self._screen_height /
                             self._avoid_zero(distance))
 
         return size
@@ -50,38 +65,69 @@ class Plotter:
         """get a vector that represents the direction a ray travels from the player
            through the screen/camera plane at horizontal position / pixel column x"""
 
-        # what percentage of the screen with is the current x value.
-        x_ratio = x / settings.SCREEN_WIDTH
-
         # x-coordinate along camera plane, from -1 through 0 and on to 1
-        camera_x = (2 * x_ratio) - 1
+        camera_x = self._camera_x_list[x]
 
         # The current ray is the sum of the player direction and the x-coordinate along camera plane
         return player.direction + player.camera_plane * camera_x
 
+    def get_camera_space_position(self, player, position):
+        """get how far in front of the player a position is (its perceptual distance) and where it is across
+           the camera plane, from -1 (the left edge of the screen) through 0 and on to 1 (the right edge)"""
+
+        relative_position = position - player.position
+
+        # we want to know how many player directions (depth) and camera planes (across) we need to add together
+        # to get to the position. Solve that pair of equations using Cramer's rule.
+        determinant = self._avoid_zero(
+            player.direction.x * player.camera_plane.y - player.camera_plane.x * player.direction.y)
+
+        depth = (relative_position.x * player.camera_plane.y -
+                 player.camera_plane.x * relative_position.y) / determinant
+        across = (player.direction.x * relative_position.y -
+                  relative_position.x * player.direction.y) / determinant
+
+        # the camera plane gets wider the further away from the player we are, just like the rays do.
+        camera_x = across / self._avoid_zero(depth)
+
+        return depth, camera_x
+
     def get_distance_delta(self, ray_direction):
         """length of ray from one x or y-side to next x or y-side"""
         # see https://gamedev.stackexchange.com/q/45013 for a better explanation.
 
-        # calculate how the ratios of 1 to the x and y components
-        # that is what number do you need to multiply x or y by to turn them into 1.
-        x_ratio = 1 / self._avoid_zero(ray_direction.x)
-        y_ratio = 1 / self._avoid_zero(ray_direction.y)
-
-        # create vectors for where x/y has length 1 using these multipliers.
-        scaled_x = ray_direction * x_ratio
-        scaled_y = ray_direction * y_ratio
-
-        # the length of these vectors represent how far the ray has to travel to move one unit in x or one unit in y.
-        # Remember, we can get the length of a vector with the Pythagorean theorem.
-        # a*a + b*b = c*c OR
-        # x*x + y*y = length * length SO
-        # length = sqrt(x*x + y*y)
-        distance_delta = Vector2()
-        distance_delta.x = scaled_x.length()
-        distance_delta.y = scaled_y.length()
-
-        return distance_delta
+        # the ray has to travel 1 / x to move one unit in x, making its full length |ray| / |x|.
+        # We only ever compare these two distances with each other and both have the same |ray| in them,
+        # so we can leave it out: the same steps get taken either way, and it saves two square roots per ray.
+        return Vector2(abs(1 / self._avoid_zero(ray_direction.x)), abs(1 / self._avoid_zero(ray_direction.y)))
+
+    def get_rays(self, player):
+        """get the ray direction and distance delta of every column as arrays of floats: ray x, ray y, delta x, delta y.
+
+        These only change when the player turns, so they are worked out once per rotation rather than every frame.
+        Treat the arrays as read only, they are shared between frames.
+        It is safe to call from several threads at once, see FramePipeline.
+        """
+
+        rotation = (player.direction.x, player.direction.y, player.camera_plane.x, player.camera_plane.y)
+        rays_rotation, rays = self._rays
+
+        if rotation != rays_rotation:
+            # The current ray is the sum of the player direction and the x-coordinate along camera plane
+            ray_x = player.direction.x + player.camera_plane.x * self.camera_x
+            ray_y = player.direction.y + player.camera_plane.y * self.camera_x
+
+            # avoid a divide by zero, exactly like _avoid_zero does, then see get_distance_delta
+            delta_x = np.abs(1 / np.where(ray_x == 0, 0.000001, ray_x))
+            delta_y = np.abs(1 / np.where(ray_y == 0, 0.000001, ray_y))
+
+            rays = ray_x, ray_y, delta_x, delta_y
+
+            # the rotation and its rays are swapped in with one assignment, and only our own copy is returned,
+            # so a thread working out the rays for another rotation at the same time can't mix them up
+            self._rays = rotation, rays
+
+        return rays
 
     def get_wall_x_across_percentage(self, side, player_pos, ray_direction, perceptual_wall_distance):
         """get where exactly a wall was hit in terms of a value between 0 and 1."""
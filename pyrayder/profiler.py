@@ -0,0 +1,133 @@
+"""This module contains a lightweight profiler for timing each stage of a frame"""
+
+import json
+from collections import deque
+from contextlib import nullcontext
+from time import perf_counter_ns
+
+import numpy as np
+
+# handed out for every stage when profiling is off, so timing a stage costs next to nothing
+_NOT_TIMED = nullcontext()
+
+NANOSECONDS_IN_A_MILLISECOND = 1000000
+NANOSECONDS_IN_A_MICROSECOND = 1000
+
+
+class _TimedStage:
+    """A context manager that records how long the code inside it takes to run"""
+
+    __slots__ = ('_profiler', '_name', '_start')
+
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._start = perf_counter_ns()
+
+    def __exit__(self, *exception_info):
+        self._profiler.record(self._name, self._start, perf_counter_ns())
+
+
+class FrameProfiler:
+    """This type times named stages of each frame with a high resolution timer.
+
+    It keeps the most recent timings of every stage so it can report rolling averages, percentiles
+    and histograms, and can export them as JSON or as a trace for chrome://tracing.
+    When it is disabled, stage() returns a shared do nothing context manager.
+    """
+
+    def __init__(self, enabled=False, window=300, max_trace_events=100000):
+        self.enabled = enabled
+
+        # stage name -> the last `window` durations in nanoseconds
+        self._window = window
+        self._durations = {}
+
+        # (name, start, end) for every stage timed, oldest first, for exporting as a trace
+        self._trace_events = deque(maxlen=max_trace_events)
+
+    def stage(self, name):
+        """time everything inside a with block as the named stage"""
+
+        if not self.enabled:
+            return _NOT_TIMED
+
+        return _TimedStage(self, name)
+
+    def record(self, name, start, end):
+        """record that a stage ran between two perf_counter_ns() times"""
+
+        durations = self._durations.get(name)
+
+        if durations is None:
+            durations = self._durations[name] = deque(maxlen=self._window)
+
+        durations.append(end - start)
+        self._trace_events.append((name, start, end))
+
+    def get_stage_names(self):
+        """get the name of every stage timed so far, in the order they were first timed"""
+        return list(self._durations)
+
+    def get_mean_milliseconds(self, name):
+        """get the rolling average time a stage took in milliseconds, or 0 if it has never been timed"""
+
+        durations = self._durations.get(name)
+
+        if not durations:
+            return 0
+
+        return sum(durations) / len(durations) / NANOSECONDS_IN_A_MILLISECOND
+
+    def get_histogram(self, name, bins=10):
+        """get a histogram of the recent times of a stage as (counts, bin edges in milliseconds)"""
+
+        return np.histogram(np.array(self._durations[name]) / NANOSECONDS_IN_A_MILLISECOND, bins)
+
+    def get_summary(self):
+        """get the mean, p50 and p99 of the recent times of every stage in milliseconds"""
+
+        summary = {}
+
+        for name, durations in self._durations.items():
+            milliseconds = np.array(durations) / NANOSECONDS_IN_A_MILLISECOND
+
+            summary[name] = {
+                'samples': len(milliseconds),
+                'mean_ms': float(np.mean(milliseconds)),
+                'p50_ms': float(np.percentile(milliseconds, 50)),
+                'p99_ms': float(np.percentile(milliseconds, 99)),
+            }
+
+        return summary
+
+    def export_json(self, path):
+        """write the summary and histogram of every stage to a JSON file"""
+
+        report = self.get_summary()
+
+        for name, stage_report in report.items():
+            counts, edges = self.get_histogram(name)
+            stage_report['histogram'] = {'counts': counts.tolist(), 'edges_ms': edges.tolist()}
+
+        with open(path, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    def export_chrome_trace(self, path):
+        """write every timed stage to a file that can be opened with chrome://tracing or Perfetto"""
+
+        first_start = self._trace_events[0][1] if self._trace_events else 0
+
+        events = [{
+            'name': name,
+            'ph': 'X',  # a complete event, with a start and a duration
+            'ts': (start - first_start) / NANOSECONDS_IN_A_MICROSECOND,
+            'dur': (end - start) / NANOSECONDS_IN_A_MICROSECOND,
+            'pid': 0,
+            'tid': 0,
+        } for name, start, end in self._trace_events]
+
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': events}, file)
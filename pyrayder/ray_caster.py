@@ -0,0 +1,258 @@
+"""This module contains types that cast rays from the player into the map to find walls"""
+
+from collections import namedtuple
+
+import numpy as np
+from pygame.math import Vector2
+
+import level
+import settings
+from plotter import Plotter
+from side import Side
+
+# everything we know about the wall hit by each ray (one entry per screen column)
+RayHits = namedtuple(
+    'RayHits', 'perceptual_wall_distance side map_x map_y texture_index texture_x')
+
+
+class RayCaster:
+    """This type casts every ray for a frame at once using arrays.
+
+    Instead of walking one ray through the map at a time, all the rays are advanced together
+    in lockstep (one DDA step per loop) until every one of them has hit a wall.
+    Rays out in open space first skip every square they can without getting near a wall, using the level's
+    wall distances, so long rays across big open maps take a handful of loops rather than one per square.
+    The results are the same as ScalarRayCaster, just a lot faster.
+    """
+
+    def __init__(self, game_level, screen_width=settings.SCREEN_WIDTH):
+        self._tiles = game_level.tiles
+        self._flags = game_level.flags
+        self._wall_distances = game_level.wall_distances
+        self._level_height = game_level.height
+        self._screen_width = screen_width
+
+        # keeps the direction of every column's ray, which only changes when the player turns
+        self._plotter = Plotter(screen_width)
+
+    def cast(self, player, texture_width, columns=slice(None)):
+        """cast one ray per screen column for the player and return the walls they hit as RayHits.
+
+        Pass a slice as columns to only cast the rays for part of the screen.
+        """
+
+        ray_x, ray_y, delta_x, delta_y = (values[columns] for values in self._plotter.get_rays(player))
+
+        origin_x = np.full(ray_x.size, player.position.x)
+        origin_y = np.full(ray_x.size, player.position.y)
+
+        return self._cast(origin_x, origin_y, ray_x, ray_y, delta_x, delta_y, texture_width)
+
+    def _skip_open_squares(self, active, map_x, map_y, step_x, step_y,
+                           distance_to_side_x, distance_to_side_y, delta_x, delta_y):
+        """move the active rays that are out in the open over all the squares they can without hitting a wall.
+
+        If the nearest wall is n squares away, every square less than n squares away in x and y is open.
+        A ray can take every DDA step up to the first one that leaves that square of open squares,
+        so we count how many steps in x and in y come before it and take them all at once.
+        The ray ends up exactly where stepping one square at a time would leave it, still in an open square.
+        """
+
+        wall_distances = self._wall_distances[map_x[active] * self._level_height + map_y[active]]
+
+        in_the_open = wall_distances > 1
+        if not in_the_open.any():
+            return
+
+        rays = active[in_the_open]
+        reach = wall_distances[in_the_open] - 1
+
+        # the distance along the ray of the first step that would leave the open squares
+        limit = np.minimum(distance_to_side_x[rays] + reach * delta_x[rays],
+                           distance_to_side_y[rays] + reach * delta_y[rays])
+
+        steps_x = np.clip(np.ceil((limit - distance_to_side_x[rays]) / delta_x[rays]), 0, reach).astype(np.intp)
+        steps_y = np.clip(np.ceil((limit - distance_to_side_y[rays]) / delta_y[rays]), 0, reach).astype(np.intp)
+
+        map_x[rays] += steps_x * step_x[rays]
+        map_y[rays] += steps_y * step_y[rays]
+        distance_to_side_x[rays] += steps_x * delta_x[rays]
+        distance_to_side_y[rays] += steps_y * delta_y[rays]
+
+    def cast_rays(self, origin_x, origin_y, ray_x, ray_y, texture_width):
+        """cast any number of rays given as arrays of origins and directions"""
+
+        # length of ray from one x or y-side to next x or y-side, avoiding a divide by zero
+        # exactly like Plotter._avoid_zero does. See Plotter.get_distance_delta.
+        delta_x = np.abs(1 / np.where(ray_x == 0, 0.000001, ray_x))
+        delta_y = np.abs(1 / np.where(ray_y == 0, 0.000001, ray_y))
+
+        return self._cast(origin_x, origin_y, ray_x, ray_y, delta_x, delta_y, texture_width)
+
+    def _cast(self, origin_x, origin_y, ray_x, ray_y, delta_x, delta_y, texture_width):
+
+        # which box of the map each ray starts in
+        map_x = origin_x.astype(np.intp)
+        map_y = origin_y.astype(np.intp)
+
+        # what direction to step in x or y-direction (either +1 or -1)
+        step_x = np.where(ray_x < 0, -1, 1)
+        step_y = np.where(ray_y < 0, -1, 1)
+
+        # length of ray from current position to next x or y-side, see Plotter.get_distance_to_side
+        distance_to_side_x = delta_x * np.where(ray_x < 0, origin_x - map_x, map_x + 1 - origin_x)
+        distance_to_side_y = delta_y * np.where(ray_y < 0, origin_y - map_y, map_y + 1 - origin_y)
+
+        side = np.full(ray_x.shape, Side.LeftOrRight.value, dtype=np.int8)
+
+        # perform DDA on every ray that has not hit anything yet
+        active = np.arange(ray_x.size)
+        while active.size:
+            self._skip_open_squares(
+                active, map_x, map_y, step_x, step_y, distance_to_side_x, distance_to_side_y, delta_x, delta_y)
+
+            move_in_x = distance_to_side_x[active] < distance_to_side_y[active]
+
+            moving_x = active[move_in_x]
+            distance_to_side_x[moving_x] += delta_x[moving_x]
+            map_x[moving_x] += step_x[moving_x]
+            side[moving_x] = Side.LeftOrRight.value
+
+            moving_y = active[~move_in_x]
+            distance_to_side_y[moving_y] += delta_y[moving_y]
+            map_y[moving_y] += step_y[moving_y]
+            side[moving_y] = Side.TopOrBottom.value
+
+            # Check if ray has hit a wall. The level is stored flat, so square (x, y) is at x * height + y
+            hit = self._flags[map_x[active] * self._level_height + map_y[active]] & level.WALL
+            active = active[hit == 0]
+
+        hit_left_or_right = side == Side.LeftOrRight.value
+
+        # Calculate distance projected on camera direction, see Plotter.get_perceptual_wall_distance
+        with np.errstate(divide='ignore', invalid='ignore'):
+            perceptual_wall_distance = np.where(
+                hit_left_or_right,
+                (map_x - origin_x + (1 - step_x) / 2) / ray_x,
+                (map_y - origin_y + (1 - step_y) / 2) / ray_y)
+
+        perceptual_wall_distance[perceptual_wall_distance == 0] = 0.000001
+
+        # where exactly the wall was hit in terms of a value between 0 and 1,
+        # see Plotter.get_wall_x_across_percentage
+        wall_x = np.where(
+            hit_left_or_right,
+            origin_y + perceptual_wall_distance * ray_y,
+            origin_x + perceptual_wall_distance * ray_x) % 1
+
+        texture_x = (wall_x * texture_width).astype(np.intp)
+
+        # flip the texture on left and top sides so we don't draw it backwards like we are behind it.
+        flip = (hit_left_or_right & (ray_x > 0)) | (~hit_left_or_right & (ray_y < 0))
+        texture_x = np.where(flip, texture_width - 1 - texture_x, texture_x)
+
+        # -1 so we can start at index 0 of texture array
+        texture_index = np.maximum(self._tiles[map_x * self._level_height + map_y].astype(np.intp) - 1, 0)
+
+        return RayHits(perceptual_wall_distance, side, map_x, map_y, texture_index, texture_x)
+
+
+class ScalarRayCaster:
+    """This type casts rays one column at a time using Plotter.
+
+    It is much slower than RayCaster, but it is the reference implementation of the
+    ray casting maths so we keep it around to check faster casters against.
+    """
+
+    def __init__(self, game_level, screen_width=settings.SCREEN_WIDTH):
+        self._map = game_level.grid.tolist()
+        self._flags = game_level.flag_grid.tolist()
+        self._screen_width = screen_width
+        self.plotter = Plotter(screen_width)
+
+    def _perform_dda(self, distance_to_side, distance_delta, step, side, map_pos):
+
+        # jump to next map square, OR in x-direction, OR in y-direction - whichever is the closest side.
+        if distance_to_side.x < distance_to_side.y:
+
+            # increase the distance to side x by 1 map unit in x on the direction of this vector.
+            # This means we will go from touching the next left/right side wall the the wall 1 unit after that.
+            distance_to_side.x += distance_delta.x
+
+            # increase the mapX index by 1/-1 depending on direction.
+            map_pos.x += step.x
+
+            # we are moving in x, so the current side to check is the left or right side.
+            side = Side.LeftOrRight
+
+        else:
+            # increase the distance to side x by 1 map unit in y on the direction of this vector.
+            # This means we will go from touching the next top/bottom side wall the the wall 1 unit after that.
+            distance_to_side.y += distance_delta.y
+
+            # increase the mapY index by 1/-1 depending on direction.
+            map_pos.y += step.y
+
+            # we are moving in y, so the current side to check is the top or bottom side.
+            side = Side.TopOrBottom
+
+        # Check if ray has hit a wall
+        map_flags = self._flags[int(map_pos.x)][int(map_pos.y)]
+
+        # we return two values here to get around the immutability of ints in python (an enum is basically an int!)
+        if map_flags & level.WALL:
+            return True, side
+        else:
+            return False, side
+
+    def _cast_column(self, x, player, texture_width):
+
+        # which box of the map we're in
+        map_pos = Vector2()
+        map_pos.x = int(player.position.x)
+        map_pos.y = int(player.position.y)
+
+        ray_direction = self.plotter.get_ray_direction(x, player)
+
+        distance_delta = self.plotter.get_distance_delta(ray_direction)
+
+        # length of ray from current position to next x or y-side
+        distance_to_side = self.plotter.get_distance_to_side(player.position, map_pos, ray_direction, distance_delta)
+
+        # what direction to step in x or y-direction (either +1 or -1)
+        step = Vector2()
+        step.x = -1 if ray_direction.x < 0 else 1
+        step.y = -1 if ray_direction.y < 0 else 1
+
+        side = Side.LeftOrRight  # was a NS or a EW wall hit?
+
+        # perform DDA
+        hit = False
+        while not hit:
+            hit, side = self._perform_dda(distance_to_side, distance_delta, step, side, map_pos)
+
+        # Calculate distance projected on camera direction (oblique distance will give fisheye effect!)
+        perceptual_wall_distance = self.plotter.get_perceptual_wall_distance(side, player, map_pos, step, ray_direction)
+
+        wall_x_across_percentage = self.plotter.get_wall_x_across_percentage(side, player.position, ray_direction, perceptual_wall_distance)
+
+        # wall x will be somewhere between 0 and 1 (eg, 25% across will be 0.25)
+        # figure out how many pixels across the texture to be in x
+        texture_x = int(wall_x_across_percentage * texture_width)
+
+        # if side is left/right and we are travelling right, we have hit a LEFT side.
+        # if side is top/bottom and we are travelling down, we have hit a TOP side.
+        # draw the texture from right to left (NOT left to right as normal)
+        # as otherwise we will draw the texture backwards like we are behind it.
+        if (side == Side.LeftOrRight and ray_direction.x > 0) or (side == Side.TopOrBottom and ray_direction.y < 0):
+            texture_x = texture_width - 1 - texture_x
+
+        # get wall texture to use. -1 so we can start at index 0 of texture array
+        texture_index = max(0, self._map[int(map_pos.x)][int(map_pos.y)] - 1)
+
+        return perceptual_wall_distance, side.value, int(map_pos.x), int(map_pos.y), texture_index, texture_x
+
+    def cast(self, player, texture_width):
+        """cast one ray per screen column for the player and return the walls they hit as RayHits"""
+        columns = [self._cast_column(x, player, texture_width) for x in range(self._screen_width)]
+        return RayHits(*(np.array(values) for values in zip(*columns)))
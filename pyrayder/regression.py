@@ -0,0 +1,280 @@
+"""This module checks the fast renderers against the reference implementations and times the ray casting maths,
+so any change that alters the picture or slows things down gets caught"""
+
+import hashlib
+import json
+import os
+import random
+import time
+import timeit
+
+import numpy as np
+import pygame
+from pygame.math import Vector2
+
+import level
+import settings
+from benchmark import get_camera_path
+from player import Player
+from plotter import Plotter
+from ray_caster import RayCaster, ScalarRayCaster
+from renderer import Renderer
+from side import Side
+
+# how far RayCaster's wall distances may be from ScalarRayCaster's, as a fraction of the distance
+DISTANCE_TOLERANCE = 1e-9
+
+# how many times slower than the baseline a timing may get before it counts as a regression, e.g. 0.25 is 25%
+TIMING_TOLERANCE = 0.25
+
+# the render scales full frames are timed at
+RENDER_SCALES = (0.5, 1.0)
+
+
+def get_levels(game_level):
+    """get the levels to test with by name: the level being played and a couple of bigger generated ones"""
+
+    return {
+        'level': game_level,
+        'open-64': level.generate_level(64, 64, wall_fraction=0.02, seed=1),
+        'dense-256': level.generate_level(256, 256, wall_fraction=0.1, seed=2),
+    }
+
+
+def get_random_players(game_level, count, seed=0):
+    """get players standing at random places in squares of a level without walls, facing random ways.
+    A quarter of them face exactly along the x or y axis, where the maths has to avoid dividing by zero."""
+
+    generator = random.Random(seed)
+    empty_squares = list(zip(*np.nonzero((game_level.flag_grid & level.WALL) == 0)))
+
+    players = []
+
+    for player_number in range(count):
+        x, y = empty_squares[generator.randrange(len(empty_squares))]
+
+        player = Player(Vector2(float(x) + generator.uniform(0.05, 0.95), float(y) + generator.uniform(0.05, 0.95)),
+                        Vector2(settings.PLAYER_START_DIRECTION), Vector2(settings.PLAYER_START_CAMERA_PLANE))
+        player.rotate(generator.choice((0, 90, 180, 270)) if player_number % 4 == 0 else generator.uniform(0, 360))
+        players.append(player)
+
+    return players
+
+
+def check_ray_casters(game_level, players, texture_width=64):
+    """Cast every player's rays with RayCaster and with the reference ScalarRayCaster and return a description
+    of every way they differ. The squares, sides and texture columns hit must be exactly the same and the
+    distances must be within DISTANCE_TOLERANCE."""
+
+    ray_caster = RayCaster(game_level)
+    reference = ScalarRayCaster(game_level)
+
+    problems = []
+
+    for player_number, player in enumerate(players):
+        hits = ray_caster.cast(player, texture_width)
+        reference_hits = reference.cast(player, texture_width)
+
+        for field in ('side', 'map_x', 'map_y', 'texture_index', 'texture_x'):
+            columns = np.flatnonzero(getattr(hits, field) != getattr(reference_hits, field))
+
+            if columns.size:
+                problems.append(f'player {player_number}: {field} differs in columns {columns.tolist()}')
+
+        relative_error = np.abs(hits.perceptual_wall_distance - reference_hits.perceptual_wall_distance) / \
+            reference_hits.perceptual_wall_distance
+        columns = np.flatnonzero(relative_error > DISTANCE_TOLERANCE)
+
+        if columns.size:
+            problems.append(f'player {player_number}: perceptual_wall_distance differs in columns {columns.tolist()}')
+
+    return problems
+
+
+def _draw_frame(renderer, player, framebuffer_rendering):
+    settings.FRAMEBUFFER_RENDERING = framebuffer_rendering
+    renderer.invalidate()
+    renderer.draw(player, settings.TARGET_FPS)
+
+    return pygame.surfarray.array2d(renderer.SCREEN)
+
+
+def check_frames(renderer, players):
+    """Draw a frame for every player with the framebuffer and with the blit wall renderer, which must match
+    pixel for pixel. Returns a description of every frame that doesn't and a hash of every frame."""
+
+    problems = []
+    frame_hashes = []
+    framebuffer_rendering = settings.FRAMEBUFFER_RENDERING
+
+    try:
+        for player_number, player in enumerate(players):
+            frame = _draw_frame(renderer, player, True)
+
+            if not np.array_equal(frame, _draw_frame(renderer, player, False)):
+                problems.append(f'player {player_number}: the framebuffer and blit renderers draw different frames')
+
+            frame_hashes.append(hashlib.sha1(frame.tobytes()).hexdigest())
+
+    finally:
+        settings.FRAMEBUFFER_RENDERING = framebuffer_rendering
+
+    return problems, frame_hashes
+
+
+def _time_nanoseconds(function):
+    """get the fastest time one call of a function takes, in nanoseconds"""
+
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+
+    return min(timer.repeat(3, number)) / number * 1e9
+
+
+def time_plotter(game_level):
+    """time every Plotter method and one DDA step of ScalarRayCaster, in nanoseconds per call"""
+
+    plotter = Plotter()
+    player = get_random_players(game_level, 1, seed=1)[0]
+
+    ray_direction = plotter.get_ray_direction(settings.SCREEN_WIDTH // 3, player)
+    distance_delta = plotter.get_distance_delta(ray_direction)
+    map_position = Vector2(int(player.position.x), int(player.position.y))
+    distance_to_side = plotter.get_distance_to_side(player.position, map_position, ray_direction, distance_delta)
+    step = Vector2(-1 if ray_direction.x < 0 else 1, -1 if ray_direction.y < 0 else 1)
+    scalar_ray_caster = ScalarRayCaster(game_level)
+
+    return {
+        'Plotter.get_ray_direction': _time_nanoseconds(
+            lambda: plotter.get_ray_direction(settings.SCREEN_WIDTH // 3, player)),
+        'Plotter.get_distance_delta': _time_nanoseconds(lambda: plotter.get_distance_delta(ray_direction)),
+        'Plotter.get_distance_to_side': _time_nanoseconds(
+            lambda: plotter.get_distance_to_side(player.position, map_position, ray_direction, distance_delta)),
+        'Plotter.get_perceptual_wall_distance': _time_nanoseconds(
+            lambda: plotter.get_perceptual_wall_distance(Side.LeftOrRight, player, map_position, step, ray_direction)),
+        'Plotter.get_wall_x_across_percentage': _time_nanoseconds(
+            lambda: plotter.get_wall_x_across_percentage(Side.LeftOrRight, player.position, ray_direction, 2.5)),
+        'Plotter.get_object_size_based_on_distance': _time_nanoseconds(
+            lambda: plotter.get_object_size_based_on_distance(2.5)),
+        'Plotter.get_camera_space_position': _time_nanoseconds(
+            lambda: plotter.get_camera_space_position(player, map_position)),
+        # the player never turns here, so this is the cost of checking the rays don't need working out again
+        'Plotter.get_rays': _time_nanoseconds(lambda: plotter.get_rays(player)),
+        # _perform_dda moves the ray along, so give it fresh copies of the vectors it changes every time
+        'ScalarRayCaster._perform_dda': _time_nanoseconds(
+            lambda: scalar_ray_caster._perform_dda(
+                Vector2(distance_to_side), distance_delta, step, Side.LeftOrRight, Vector2(map_position))),
+    }
+
+
+def time_frames(renderer, path, repeats=3):
+    """time drawing every frame of a camera path, returning the best mean time per frame in milliseconds"""
+
+    # draw a frame first so one off costs like filling caches don't count
+    renderer.draw(path[0], settings.TARGET_FPS)
+
+    best_seconds = float('inf')
+
+    for _ in range(repeats):
+        start = time.perf_counter()
+
+        for player in path:
+            renderer.invalidate()
+            renderer.draw(player, settings.TARGET_FPS)
+
+        best_seconds = min(best_seconds, time.perf_counter() - start)
+
+    return best_seconds / len(path) * 1000
+
+
+def measure(game_level, frame_count=30, check_count=20):
+    """run every check and time everything, returning the results as a dictionary that can be saved as JSON"""
+
+    results = {'problems': [], 'frame_hashes': {}, 'micro_ns': time_plotter(game_level), 'frame_ms': {}}
+
+    for name, test_level in get_levels(game_level).items():
+        players = get_random_players(test_level, check_count)
+
+        results['problems'] += [f'{name} {problem}' for problem in check_ray_casters(test_level, players)]
+
+        renderer = Renderer(test_level)
+
+        try:
+            problems, frame_hashes = check_frames(renderer, players[:frame_count])
+            results['problems'] += [f'{name} {problem}' for problem in problems]
+            results['frame_hashes'][name] = frame_hashes
+
+            path = get_camera_path(test_level, frame_count)
+
+            for render_scale in RENDER_SCALES:
+                renderer.set_render_scale(render_scale)
+                frame_name = f'{name} at {renderer.render_width}x{renderer.render_height}'
+                results['frame_ms'][frame_name] = time_frames(renderer, path)
+
+        finally:
+            renderer.close()
+
+    return results
+
+
+def compare(results, baseline, timing_tolerance=TIMING_TOLERANCE):
+    """get a description of everything in the results that is worse than in the baseline results"""
+
+    regressions = []
+
+    for name, frame_hashes in baseline['frame_hashes'].items():
+        if results['frame_hashes'].get(name) != frame_hashes:
+            regressions.append(f'{name}: frames are different to the baseline frames')
+
+    for group, unit in (('micro_ns', 'ns'), ('frame_ms', 'ms')):
+        for name, baseline_time in baseline[group].items():
+            time = results[group].get(name)
+
+            if time is not None and time > baseline_time * (1 + timing_tolerance):
+                regressions.append(f'{name}: {time:.2f}{unit} is slower than the baseline {baseline_time:.2f}{unit}')
+
+    return regressions
+
+
+def run(game_level, save_baseline=None, baseline=None, timing_tolerance=TIMING_TOLERANCE):
+    """check the renderers and time them, printing the results. Returns an exit code for the program.
+
+    save_baseline is a JSON file to save the results in. Passing the same file as baseline on a later run
+    fails it if any frame looks different or anything has got more than timing_tolerance slower.
+    Frame hashes and timings only mean something on the machine the baseline was saved on.
+    """
+
+    # the dummy video driver lets SDL run without a display, see benchmark.run
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.init()
+    pygame.font.init()
+
+    try:
+        results = measure(game_level)
+    finally:
+        pygame.quit()
+
+    for group, unit in (('micro_ns', 'ns'), ('frame_ms', 'ms')):
+        for name, time in results[group].items():
+            print(f'{name}: {time:.2f}{unit}')
+
+    failures = results['problems']
+
+    if baseline:
+        with open(baseline) as file:
+            failures = failures + compare(results, json.load(file), timing_tolerance)
+
+    if save_baseline:
+        with open(save_baseline, 'w') as file:
+            json.dump(results, file, indent=2)
+
+        print(f'saved the results to {save_baseline}')
+
+    for failure in failures:
+        print(f'FAILED {failure}')
+
+    if failures:
+        return 1
+
+    print('everything matches the reference implementations' + (' and the baseline' if baseline else ''))
+    return 0
@@ -1,197 +1,273 @@
 """This module defines the renderer object and related methods"""
 
 import math
-import os
 
+import numpy as np
 import pygame
 from pygame.math import Vector2
 
 import asset_loader
 import colors
-import constants
+import framebuffer
 import settings
+import ui_text
 
+from column_cache import ColumnCache
+from floor_caster import FloorCaster
+from g_buffer import GBuffer
 from plotter import Plotter
-from side import Side
-from sprite import Sprite
+from profiler import FrameProfiler
+from ray_caster import RayCaster
+from sky import Sky
+from sprite_registry import SpriteRegistry
+from strip_renderer import StripRenderer
+from visibility import load_visibility_index
+
+
+def get_texture_ids(assets):
+    """get the id of every texture the renderer needs from an AssetManager, so they can be loaded ahead of time"""
+
+    return (assets.get_group('walls') + assets.get_group('sprites') +
+            [settings.FLOOR_TEXTURE, settings.CEILING_TEXTURE, settings.SKY_TEXTURE])
 
 
 class Renderer:
     """The default software renderer of the game"""
 
-    def __init__(self):
-        self.SCREEN = pygame.display.set_mode(settings.SCREEN_SIZE)
-        self.plotter = Plotter()
+    def __init__(self, game_level, profiler=None, assets=None):
+        # use the window if one has already been opened, for example to show a loading screen
+        self.SCREEN = pygame.display.get_surface()
+
+        if self.SCREEN is None or self.SCREEN.get_size() != settings.SCREEN_SIZE:
+            self.SCREEN = pygame.display.set_mode(settings.SCREEN_SIZE)
+
+        self.level = game_level
+
+        # times every drawing stage when it is enabled, see FrameProfiler
+        self.profiler = profiler or FrameProfiler()
+
+        self.column_cache = ColumnCache(settings.COLUMN_CACHE_MAX_BYTES)
+
+        # textures are looked up by the ids in assets/manifest.json. Load every one we need now, all at once,
+        # so they can be read in parallel rather than one after another. Any already being read by the
+        # AssetManager we were given are waited for rather than read again.
+        self.assets = assets or asset_loader.AssetManager()
 
-        current_directory = os.path.dirname(os.path.realpath(__file__))
-        wall_texture_folder_path = os.path.join(
-            current_directory, "assets/textures/surfaces")
+        wall_texture_ids = self.assets.get_group('walls')
+        sprite_texture_ids = self.assets.get_group('sprites')
+        self.assets.get_textures(get_texture_ids(self.assets))
 
-        sprite_texture_folder_path = os.path.join(
-            current_directory, "assets/textures/objects")
+        self.WALL_TEXTURES = self.assets.get_textures(wall_texture_ids)
+        self.SPRITE_TEXTURES = self.assets.get_textures(sprite_texture_ids)
 
-        self.WALL_TEXTURES = asset_loader.get_textures(
-            wall_texture_folder_path)
+        # sprites are a square tall, so this is how many squares across the widest one is drawn
+        self._sprite_width = max(texture.get_width() / texture.get_height() for texture in self.SPRITE_TEXTURES)
 
-        self.SPRITE_TEXTURES = asset_loader.get_textures(
-            sprite_texture_folder_path)
+        self.WALL_TEXTURE_ATLAS = asset_loader.get_texture_atlas(self.WALL_TEXTURES)
 
-        # init the z buffer to the size of the screen. This is faster than using append() and clear()
-        self._wall_z_buffer = [None] * settings.SCREEN_WIDTH
+        # the floor is texture 0 and the ceiling texture 1, see FloorCaster
+        self.FLOOR_TEXTURE_ATLAS = asset_loader.get_texture_atlas(
+            self.assets.get_textures([settings.FLOOR_TEXTURE, settings.CEILING_TEXTURE]))
 
-    def _darken(self, surface):
-        "This method takes in a surface and drops its brightness in half"
+        visibility = None
 
-        # we create a new rectangle with the same dimensions as the texture
-        darkened_surface = pygame.Surface(surface.get_size())
+        if settings.SPRITE_VISIBILITY_INDEX:
+            visibility = load_visibility_index(game_level, settings.SPRITE_BUCKET_SIZE)
 
-        # we set the brightness of this surface to 128/half (255 is max)
-        darkened_surface.set_alpha(128)
+        self.sprite_registry = SpriteRegistry(game_level, settings.SPRITE_BUCKET_SIZE, visibility)
+
+        # made by set_render_scale, as it draws at the render resolution
+        self.strip_renderer = None
+
+        # the debug overlay's text, loaded on the first frame it is drawn
+        self._debug_labels = None
+        self._debug_glyphs = None
+
+        # the last frame drawn without the UI on top, and what it was drawn from, so we can show it again
+        # rather than drawing the same frame over and over while the player stands still
+        self._scene = pygame.Surface(settings.SCREEN_SIZE).convert()
+        self._scene_key = None
+
+        self.set_render_scale(settings.RENDER_SCALE)
+
+    def set_render_scale(self, render_scale):
+        """This method sets how big the view is drawn before it is scaled up to fill the screen,
+        as a fraction of the screen's width and height. 1 draws it at the full size of the screen.
+        """
+
+        self.render_scale = render_scale
+        self.render_width = max(int(settings.SCREEN_WIDTH * render_scale), 1)
+        self.render_height = max(int(settings.SCREEN_HEIGHT * render_scale), 1)
+        render_size = (self.render_width, self.render_height)
+
+        # draw straight onto the screen at full size, otherwise onto a smaller surface of the same pixel format
+        if render_size == settings.SCREEN_SIZE:
+            self._canvas = self.SCREEN
+        else:
+            self._canvas = pygame.Surface(render_size).convert()
 
-        # Apply the darken mask to the original surface from its origin (x:0, y:0)
-        surface.blit(darkened_surface, (0, 0))
+        # everything that depends on the number of columns or the height of the view
+        self.plotter = Plotter(self.render_width, self.render_height)
+        self.ray_caster = RayCaster(self.level, self.render_width)
+        self.sky = Sky(self.assets.get_texture(settings.SKY_TEXTURE), self.render_width, self.render_height / 2)
+
+        self.floor_caster = None
+
+        if settings.FLOOR_CASTING:
+            self.floor_caster = FloorCaster(self.level, self.FLOOR_TEXTURE_ATLAS, self.plotter, self.render_height)
+
+        # draw walls across several processes if we have been asked to. This only works when drawing to the framebuffer.
+        if settings.FRAMEBUFFER_RENDERING and settings.RENDER_WORKERS > 1:
+            if self.strip_renderer:
+                self.strip_renderer.close()
+
+            # the workers are forked from this process, so make sure no asset loading threads are running first
+            self.assets.close()
+
+            self.strip_renderer = StripRenderer(
+                self.level, self.WALL_TEXTURE_ATLAS, self.render_width, self.render_height, settings.RENDER_WORKERS)
+
+        # what every column of the view shows, filled in as the walls are drawn. See GBuffer
+        self.g_buffer = GBuffer(self.render_width)
+
+        self.invalidate()
 
     def _draw_ui(self, player, fps):
         if(__debug__):
             start_position = Vector2(10, 5)
             self._draw_debug(player, fps, start_position)
 
-    def _draw_debug_text(self, font, text, position):
+    def _draw_debug_text(self, label, value, position):
 
-        text = font.render(text, True, colors.YELLOW)
+        # labels never change so they are rendered once, the values change all the time so are drawn from glyphs.
+        label_surface = self._debug_labels.get(label, f'{label}: ')
+        self.SCREEN.blit(label_surface, (position.x, position.y))
 
-        self.SCREEN.blit(text, (position.x, position.y))
+        self._debug_glyphs.draw(self.SCREEN, value, (position.x + label_surface.get_width(), position.y))
         position.y = position.y + 35
 
     def _draw_debug(self, player, fps, start_position):
-        basicfont = pygame.font.SysFont(None, 48)
-
-        fps_text = f'fps: {fps}'
-        player_x_text = f'x: {player.position.x:.2f}'
-        player_y_text = f'y: {player.position.y:.2f}'
-        player_rotation_text = f'rotation: {player.get_rotation_degrees():.0f}'
-
-        self._draw_debug_text(basicfont, fps_text, start_position)
-        self._draw_debug_text(basicfont, player_x_text, start_position)
-        self._draw_debug_text(basicfont, player_y_text, start_position)
-        self._draw_debug_text(basicfont, player_rotation_text, start_position)
-
-    def _draw_floor(self):
-        # fill screen with back buffer color and then draw the ceiling/sky.
-        self.SCREEN.fill(colors.FLOOR_GRAY)
-
-    def _draw_wall_line(self, x, start, height, image_slice, side=Side.TopOrBottom):
+        # fonts can only be loaded once pygame has been initialised, so we load them on the first frame.
+        if self._debug_labels is None:
+            basicfont = ui_text.get_font(48)
+            self._debug_labels = ui_text.TextCache(basicfont, colors.YELLOW)
+            self._debug_glyphs = ui_text.GlyphAtlas(basicfont, colors.YELLOW)
+
+        self._draw_debug_text('fps', str(fps), start_position)
+        self._draw_debug_text('x', f'{player.position.x:.2f}', start_position)
+        self._draw_debug_text('y', f'{player.position.y:.2f}', start_position)
+        self._draw_debug_text('rotation', f'{player.get_rotation_degrees():.0f}', start_position)
+
+        # show how long each stage of the frame is taking, if we are timing them
+        if self.profiler.enabled:
+            for name in self.profiler.get_stage_names():
+                stage_text = f'{self.profiler.get_mean_milliseconds(name):.1f}ms'
+                self._draw_debug_text(name, stage_text, start_position)
+
+    def _draw_floor(self, player):
+        if self.floor_caster:
+            pixels = pygame.surfarray.pixels2d(self._canvas)
+            self.floor_caster.draw(pixels, player)
+            del pixels
+            return
+
+        # fill the bottom half of the screen, under the sky, with the floor color.
+        half_height = int(self.render_height / 2)
+        self._canvas.fill(colors.FLOOR_GRAY, (0, half_height, self.render_width, self.render_height - half_height))
+
+    def _draw_wall_line(self, x, start, height, texture_index, shade, texture_x):
         # figure out the position and size of the vertical line we want to draw on screen
         scale_rect = pygame.Rect(x, start, 1, height)
 
-        # put the area of the image we want into the space we want to put on screen
-        scaled = pygame.transform.scale(image_slice, scale_rect.size)
-
-        # draw the scaled line where we want to on the screen.
-        if (side == Side.LeftOrRight):
-            self._darken(scaled)
-
-        self.SCREEN.blit(scaled, scale_rect)
-
-    def _get_wall_texture_slice(self, ray_direction, wall_x_percentage_across, texture, side):
-        # wall x will be somewhere between 0 and 1 (eg, 25% across will be 0.25)
-        # figure out how many pixels across the texture to be in x
-        # we cast to an int to floor the value as we cannot start drawing at a non integral
-        # x value
-        texture_x = int(wall_x_percentage_across * texture.get_width())
+        # neighbouring columns and frames often want the same line, so only scale it if it isn't cached.
+        key = (texture_index, shade, texture_x, scale_rect.height)
+        scaled = self.column_cache.get(key)
 
-        # get the width of the texture where column 1 = 0, col 2 = 1 and so on.
-        zero_indexed_width = texture.get_width() - 1
+        if scaled is None:
+            # get which pixel in x from the texture we want to use
+            # it's too expensive to set each pixel directly so we
+            # map the line we want from the texture and draw that directly
+            # to the screens surface.
+            texture = self.WALL_TEXTURE_ATLAS.surfaces[shade][texture_index]
+            image_slice = self._get_wall_texture_slice(texture, texture_x)
 
-        # if side is left/right and we are travelling right, we have hit a LEFT side
-        # draw the texture from right to left (NOT left to right as normal)
-        # as otherwise we will draw the texture backwards like we are behind it.
-        if side == Side.LeftOrRight and ray_direction.x > 0:
-            texture_x = zero_indexed_width - texture_x
+            # put the area of the image we want into the space we want to put on screen
+            scaled = pygame.transform.scale(image_slice, scale_rect.size)
+            self.column_cache.put(key, scaled)
 
-        # if side is top/bottom and we are travelling down, we have hit a TOP side.
-        # draw the texture from right to left (NOT left to right as normal)
-        # as otherwise we will draw the texture backwards like we are behind it.
-        if side == Side.TopOrBottom and ray_direction.y < 0:
-            texture_x = zero_indexed_width - texture_x
+        # draw the scaled line where we want to on the screen.
+        self._canvas.blit(scaled, scale_rect)
 
+    def _get_wall_texture_slice(self, texture, texture_x):
         # get the part of the image we want to draw from the texture
         image_location = pygame.Rect(texture_x, 0, 1, texture.get_height())
         image_slice = texture.subsurface(image_location)
 
         return image_slice
 
-    def _perform_dda(self, distance_to_side, distance_delta, step, side, map_pos):
-
-        # jump to next map square, OR in x-direction, OR in y-direction - whichever is the closest side.
-        if distance_to_side.x < distance_to_side.y:
+    def cast_walls(self, player):
+        """This method casts a ray for every column of the view at once and returns the walls they hit as RayHits.
 
-            # increase the distance to side x by 1 map unit in x on the direction of this vector.
-            # This means we will go from touching the next left/right side wall the the wall 1 unit after that.
-            distance_to_side.x += distance_delta.x
+        It only changes the ray caster's cache of the rays for the player's rotation, which is safe to share
+        between threads (see Plotter.get_rays), so it can run on another thread while a frame is being drawn,
+        see FramePipeline. Returns None when the walls are drawn by worker processes, which cast their own rays.
+        """
 
-            # increase the mapX index by 1/-1 depending on direction.
-            map_pos.x += step.x
+        if self.strip_renderer:
+            return None
 
-            # we are moving in x, so the current side to check is the left or right side.
-            side = Side.LeftOrRight
+        return self.ray_caster.cast(player, self.WALL_TEXTURE_ATLAS.texture_width)
 
-        else:
-            # increase the distance to side x by 1 map unit in y on the direction of this vector.
-            # This means we will go from touching the next top/bottom side wall the the wall 1 unit after that.
-            distance_to_side.y += distance_delta.y
+    def _draw_walls(self, player, hits=None):
 
-            # increase the mapY index by 1/-1 depending on direction.
-            map_pos.y += step.y
+        if self.strip_renderer:
+            self._draw_wall_strips(player)
+            return
 
-            # we are moving in y, so the current side to check is the top or bottom side.
-            side = Side.TopOrBottom
+        # use the rays cast ahead of time if we have them, unless the render scale has changed since
+        if hits is None or len(hits.side) != self.render_width:
+            hits = self.cast_walls(player)
 
-        # Check if ray has hit a wall
-        map_tile = settings.MAP[int(map_pos.x)][int(map_pos.y)]
+        # pick the pre-shaded texture to draw each column with, darker for left or right sides and with any fog
+        shades = self.WALL_TEXTURE_ATLAS.get_shades(hits.side, hits.perceptual_wall_distance)
 
-        # we return two values here to get around the immutability of ints in python (an enum is basically an int!)
-        if map_tile > 0 and map_tile < 10:
-            return True, side
+        if settings.FRAMEBUFFER_RENDERING:
+            self._draw_wall_framebuffer(hits, shades)
         else:
-            return False, side
-
-    def _get_wall_texture_for_block(self, map_pos):
-        # get wall texture to use. -1 so we can start at index 0 of texture array
-        texture_index = settings.MAP[int(map_pos.x)][int(map_pos.y)] - 1
-        texture_index = max(0, texture_index)
-        return self.WALL_TEXTURES[texture_index]
+            self._draw_wall_lines(hits, shades)
 
-    def _draw_walls(self, player):
+        self._update_g_buffer(player, hits)
 
-        for x in range(0, settings.SCREEN_WIDTH):
+    def _draw_wall_strips(self, player):
+        # the worker processes cast the rays and draw the walls, all we need to do is hand them the screen.
+        pixels = pygame.surfarray.pixels2d(self._canvas)
+        hits = self.strip_renderer.draw_walls(pixels, player)
+        del pixels
 
-            # which box of the map we're in
-            map_pos = Vector2()
-            map_pos.x = int(player.position.x)
-            map_pos.y = int(player.position.y)
+        self._update_g_buffer(player, hits)
 
-            ray_direction = self.plotter.get_ray_direction(x, player)    
+    def _update_g_buffer(self, player, hits):
+        ray_x, ray_y, _, _ = self.plotter.get_rays(player)
+        self.g_buffer.update(hits, ray_x, ray_y)
 
-            distance_delta = self.plotter.get_distance_delta(ray_direction)
+    def _draw_wall_framebuffer(self, hits, shades):
+        # the pixel array locks the screen surface until it is deleted, so keep it around for as short a time as possible.
+        pixels = pygame.surfarray.pixels2d(self._canvas)
+        framebuffer.draw_wall_columns(
+            pixels, hits, self.WALL_TEXTURE_ATLAS.pixels, shades)
+        del pixels
 
-            # length of ray from current position to next x or y-side
-            distance_to_side = self.plotter.get_distance_to_side(player.position, map_pos, ray_direction, distance_delta)
+    def _draw_wall_lines(self, hits, shades):
 
-            # what direction to step in x or y-direction (either +1 or -1)
-            step = Vector2()
-            step.x = -1 if ray_direction.x < 0 else 1
-            step.y = -1 if ray_direction.y < 0 else 1
+        # plain python lists are much faster to index one item at a time than numpy arrays
+        distances = hits.perceptual_wall_distance.tolist()
+        shades = shades.tolist()
+        texture_indices = hits.texture_index.tolist()
+        texture_xs = hits.texture_x.tolist()
 
-            side = Side.LeftOrRight  # was a NS or a EW wall hit?
+        for x in range(0, self.render_width):
 
-            # perform DDA
-            hit = False
-            while not hit:
-                hit, side = self._perform_dda(distance_to_side, distance_delta, step, side, map_pos)
-
-            # Calculate distance projected on camera direction (oblique distance will give fisheye effect!)
-            perceptual_wall_distance = self.plotter.get_perceptual_wall_distance(side, player, map_pos, step, ray_direction)
+            perceptual_wall_distance = distances[x]
 
             # Calculate height of line to draw on screen
             # we bring this into screen space by calculating as distance 1 (at the same point as the camera plane) = screenheight. Distance 2 = 1/2 screenheight. Distance 0.5 = 2 * screenheight.
@@ -200,113 +276,146 @@ class Renderer:
 
             # calculate lowest and highest pixel to fill in current stripe
             # a start of a line can be through of as half the line up (-y) from the center of the screen in y (screen height /2).
-            draw_start = (-line_height / 2) + settings.HALF_SCREEN_HEIGHT
+            draw_start = (-line_height / 2) + self.render_height / 2
 
-            texture = self._get_wall_texture_for_block(map_pos)
+            self._draw_wall_line(
+                x, draw_start, line_height, texture_indices[x], shades[x], texture_xs[x])
 
-            wall_x_across_percentage = self.plotter.get_wall_x_across_percentage(side, player.position, ray_direction, perceptual_wall_distance)
+    def _draw_sprite(self, visible_sprite, z_buffer):
+        texture = self.SPRITE_TEXTURES[(visible_sprite.sprite.sprite_index - 11) % len(self.SPRITE_TEXTURES)]
+        texture_width, texture_height = texture.get_size()
 
-            # get which pixel in x from the texture we want to use
-            # it's too expensive to set each pixel directly so we
-            # map the line we want from the texture and draw that directly
-            # to the screens surface.
-            texture_slice = self._get_wall_texture_slice(
-                ray_direction, wall_x_across_percentage, texture, side)
+        # sprites get smaller the further away they are, just like walls.
+        height = self.plotter.get_object_size_based_on_distance(visible_sprite.depth)
+        width = int(height * texture_width / texture_height)
 
-            self._draw_wall_line(
-                x, draw_start, line_height, texture_slice, side)
+        # work out where the sprite is on screen, centered on its position across the camera plane
+        left = int((visible_sprite.camera_x + 1) * self.render_width / 2) - width // 2
+        top = int(self.render_height / 2 - height / 2)
 
-            # add this to z buffer
-            self._wall_z_buffer[x] = (perceptual_wall_distance)
+        # clip the sprite to the screen
+        start_x = max(left, 0)
+        end_x = min(left + width, self.render_width)
+        start_y = max(top, 0)
+        end_y = min(top + height, self.render_height)
 
-    def _get_sprite_positions(self, player):
-        # find all sprites on the map!
-        sprite_positions = []
+        if start_x >= end_x or start_y >= end_y:
+            return
 
-        for column in range(len(settings.MAP)):
+        # check the z buffer, the sprite can only be seen in columns where the wall is further away than it is.
+        # If it is behind the walls in every column, don't bother drawing it at all.
+        visible_columns = z_buffer[start_x:end_x] > visible_sprite.depth
 
-            for y in range(len(settings.MAP[column])):
+        if not visible_columns.any():
+            return
 
-                value = settings.MAP[column][y]
-                
-                if value > 10 and value < 20:  # ignore non sprite objects
-                    sprite_pos = Vector2(column + 0.5, y + 0.5)
-                    distance_from_player = abs(
-                        (player.position - sprite_pos).length())
-                    sprite = Sprite(
-                        value, sprite_pos, distance_from_player)
-                    sprite_positions.append(sprite)
+        # only scale the part of the texture that is on screen, as sprites right in front of the player can be huge.
+        x_scale = texture_width / width
+        y_scale = texture_height / height
+        texture_location = pygame.Rect(
+            int((start_x - left) * x_scale), int((start_y - top) * y_scale),
+            math.ceil((end_x - start_x) * x_scale), math.ceil((end_y - start_y) * y_scale))
+        texture_location = texture_location.clip(texture.get_rect())
 
-        # sort sprite positions so the ones furthest away are drawn first
-        sprite_positions.sort(
-            key=lambda column: column.distance_from_player, reverse=True)
+        scaled = pygame.transform.scale(texture.subsurface(texture_location), (end_x - start_x, end_y - start_y))
 
-        return sprite_positions
+        # draw each run of visible columns in one go
+        run_edges = np.flatnonzero(np.diff(visible_columns, prepend=False, append=False)).tolist()
 
-    def _draw_sprite_columns(self, distance_from_player, sprite_draw_start, sprite_texture):
+        for run_start, run_end in zip(run_edges[::2], run_edges[1::2]):
+            self._canvas.blit(scaled, (start_x + run_start, start_y),
+                             pygame.Rect(run_start, 0, run_end - run_start, end_y - start_y))
 
-        current_width = sprite_texture.get_width()
-        current_height = sprite_texture.get_height()
+    def _draw_sprites(self, player):
+        z_buffer = self.g_buffer.perceptual_wall_distance
 
-        for column in range(current_width):
+        # nothing can be seen further away than the furthest wall
+        visible_sprites = self.sprite_registry.get_visible_sprites(player, z_buffer.max(), self._sprite_width)
 
-                # check z buffer (clamp index first)
-                x_check = int(sprite_draw_start.x + column)
-                x_check = max(x_check, 0)
-                x_check = min(x_check, settings.SCREEN_WIDTH - 1)
-                
-                if self._wall_z_buffer[x_check] > distance_from_player:
+        for visible_sprite in visible_sprites:
+            self._draw_sprite(visible_sprite, z_buffer)
 
-                    # draw sprite vertical line
-                    location = pygame.Rect(column, 0, 1, current_height)
-                    slice = sprite_texture.subsurface(location)
+    def _draw_sky(self, player):
+        self.sky.draw(self._canvas, player)
 
-                    sprite_image_location = (sprite_draw_start.x + column, sprite_draw_start.y)
+    def _draw_upscale(self):
+        # stretch the view over the whole screen in one go
+        pygame.transform.scale(self._canvas, settings.SCREEN_SIZE, self.SCREEN)
 
-                    self.SCREEN.blit(slice, sprite_image_location)
+    def _draw_previous_scene(self):
+        self.SCREEN.blit(self._scene, (0, 0))
 
-    def _draw_sky(self, player):
-        # load the sky texture
-        current_directory = os.path.dirname(os.path.realpath(__file__))
-        sky_texture_folder_path = os.path.join(
-            current_directory, "assets/textures/skies/sky1.png")
-        sky_texture = pygame.image.load(sky_texture_folder_path)
+    def _save_scene(self, scene_key):
+        self._scene.blit(self.SCREEN, (0, 0))
+        self._scene_key = scene_key
 
-        # calculate how much of the sky texture should be on screen
-        # based on how much the current FOV
-        fov_over_circle_ratio = settings.FOV / constants.FULL_CIRCLE_IN_RADIANS
+    def _get_scene_key(self, player):
+        # everything the scene under the UI is drawn from. Vectors are copied as tuples so moving the player changes it.
+        return (tuple(player.position), tuple(player.direction), tuple(player.camera_plane),
+                self.sprite_registry.changes)
 
-        sky_texture_window_width = sky_texture.get_width() * fov_over_circle_ratio
+    def get_stages(self, player, fps, hits=None):
+        """This method returns the named drawing stages that make up a frame, in the order they must be drawn.
+        hits are the walls hit by the player's rays if they have already been cast, see cast_walls."""
 
-        sky_texture_window_width = sky_texture_window_width * (constants.HALF_CIRCLE_IN_RADIANS / settings.FOV)
+        stages = [
+            ('sky', self._draw_sky, (player,)),
+            ('floor', self._draw_floor, (player,)),
+            ('walls', self._draw_walls, (player, hits)),
+            ('sprites', self._draw_sprites, (player,)),
+        ]
 
-        # avoid a divide by zero
-        player_rotation_in_degrees = max(player.get_rotation_degrees(), 1)
+        if self._canvas is not self.SCREEN:
+            stages.append(('upscale', self._draw_upscale, ()))
 
-        # use degrees here to avoid a negative value (player radian rotation can be negative)
-        portion = player_rotation_in_degrees / 360
+        stages.append(('ui', self._draw_ui, (player, fps)))
 
-        x_start_pos = portion * sky_texture_window_width
+        return stages
 
-        # get the part of the image we want to draw from the texture
-        image_location = pygame.Rect(x_start_pos, 0, sky_texture_window_width, sky_texture.get_height())
-        sky_texture_slice = sky_texture.subsurface(image_location)
+    def draw(self, player, fps, hits=None):
+        """This method draws everything to the screen surface without showing it.
+        Pass hits if the player's rays have already been cast, see cast_walls.
 
-        # scale that slice so it will fit the top half of the screen
-        sky_texture_slice_scaled = pygame.transform.scale(
-            sky_texture_slice, (int(settings.SCREEN_WIDTH),
-                          int(settings.HALF_SCREEN_HEIGHT)))
+        If nothing has changed since the last frame, the last frame is shown again with only the UI drawn on top.
+        """
 
-        #the sky texture scaled slice should be draw from the top left (x = 0, y = 0)
-        self.SCREEN.blit(sky_texture_slice_scaled, (0, 0))
+        scene_key = self._get_scene_key(player)
 
-    def render(self, player, fps):
-        """This method draws everything to the screen"""
-        self._draw_floor()
-        self._draw_sky(player)
-        self._draw_walls(player)
-        self._draw_ui(player, fps)
+        if scene_key == self._scene_key:
+            with self.profiler.stage('reuse'):
+                self._draw_previous_scene()
+
+            with self.profiler.stage('ui'):
+                self._draw_ui(player, fps)
+
+            return
+
+        for name, draw_stage, arguments in self.get_stages(player, fps, hits):
+
+            # keep a copy of the frame before the UI goes on top of it, to show again if nothing changes
+            if name == 'ui':
+                self._save_scene(scene_key)
+
+            with self.profiler.stage(name):
+                draw_stage(*arguments)
+
+    def invalidate(self):
+        """This method makes sure the next frame is drawn in full, even if nothing seems to have changed"""
+        self._scene_key = None
+
+    def present(self):
+        """This method shows what has been drawn on the screen surface"""
 
         # Go ahead and update the screen with what we've drawn.
         # This MUST happen after all the other drawing commands.
-        pygame.display.update()
\ No newline at end of file
+        pygame.display.update()
+
+    def render(self, player, fps):
+        """This method draws everything to the screen"""
+        self.draw(player, fps)
+        self.present()
+
+    def close(self):
+        """This method frees anything the renderer holds outside of this process, such as worker processes"""
+        if self.strip_renderer:
+            self.strip_renderer.close()
@@ -0,0 +1,53 @@
+"""This module contains a type that picks the render scale needed to keep up with a target frame rate"""
+
+from collections import deque
+
+
+class ResolutionController:
+    """This type watches how long frames take to draw and lowers or raises the render scale to match a frame time.
+
+    It averages the last few frames and only changes the scale once it has a full window of frames drawn at
+    the current scale, so one slow frame doesn't change anything and it never flips back and forth every frame.
+    The scale goes down when frames take longer than the target, and back up when they would still fit
+    in the target at the next scale up (which draws roughly scale squared as many pixels).
+    """
+
+    def __init__(self, target_milliseconds, render_scale=1.0, min_scale=0.5, max_scale=1.0, step=0.1, window=30):
+        self.render_scale = render_scale
+        self._target_milliseconds = target_milliseconds
+        self._min_scale = min_scale
+        self._max_scale = max_scale
+        self._step = step
+        self._frame_milliseconds = deque(maxlen=window)
+
+    def update(self, frame_milliseconds):
+        """add how long the last frame took to draw. Returns the new render scale if it should change, else None"""
+
+        self._frame_milliseconds.append(frame_milliseconds)
+
+        if len(self._frame_milliseconds) < self._frame_milliseconds.maxlen:
+            return None
+
+        mean_milliseconds = sum(self._frame_milliseconds) / len(self._frame_milliseconds)
+
+        if mean_milliseconds > self._target_milliseconds:
+            render_scale = max(self.render_scale - self._step, self._min_scale)
+        else:
+            # guess how long frames would take at the next scale up, leaving a little room to spare
+            render_scale = min(self.render_scale + self._step, self._max_scale)
+            scaled_milliseconds = mean_milliseconds * (render_scale / self.render_scale) ** 2
+
+            if scaled_milliseconds > self._target_milliseconds * 0.9:
+                render_scale = self.render_scale
+
+        # round so repeated steps don't drift, e.g. to 0.7000000000000001
+        render_scale = round(render_scale, 2)
+
+        if render_scale == self.render_scale:
+            return None
+
+        # start again, as frames drawn at the old scale say nothing about the new one
+        self.render_scale = render_scale
+        self._frame_milliseconds.clear()
+
+        return render_scale
@@ -1,6 +1,7 @@
 """This module contains settings and configuration data for the main game"""
 
 import math
+import os
 
 from pygame.math import Vector2
 
@@ -10,45 +11,135 @@ import constants
 TARGET_FPS = 30
 
 # flip grid 90 left for 'real' map. +y is up, +x is right.
-# 0 nothing
-# 1-10 walls
-# 11-20 enemies
-MAP = (
+# 0 nothing, open to the sky
+# 1-9 walls
+# 10 nothing, with a ceiling over it
+# 11-19 enemies
+_MAP_ROWS = (
     (1,  1,  1,  1,  1,  1,  1,  1,  1, 1),
     (1,  2,  0,  0,  0,  0,  0,  0,  0, 1),
     (1,  0,  0,  0,  0,  3,  0,  0,  0, 1),
-    (1,  0,  0,  0,  0,  0,  0,  0,  0, 1),
+    (1,  0,  0,  0,  0,  0,  0, 11,  0, 1),
     (1,  0,  0,  0,  2,  3,  0,  0,  0, 1),
     (1,  0,  0,  0,  5,  6,  0,  0,  0, 1),
-    (1,  0,  0,  0,  0,  0,  0,  0,  0, 1),
-    (1,  0,  0,  0,  0,  0,  0,  0,  4, 1),
+    (1, 10, 10, 10,  0,  0,  0, 12,  0, 1),
+    (1, 10, 10, 10,  0,  0,  0,  0,  4, 1),
     (1,  3,  3,  0,  0,  0,  0,  0,  4, 1),
     (1,  1,  1,  1,  1,  1,  1,  1,  1, 1),
 )
 
-# rotate the grid 90 degrees right to fix the issue.
-# You can find out how this works here: https://stackoverflow.com/questions/8421337
-MAP = tuple(zip(*MAP[::-1]))
+
+def _get_map():
+    # rotate the grid 90 degrees right to fix the issue.
+    # You can find out how this works here: https://stackoverflow.com/questions/8421337
+    return tuple(zip(*_MAP_ROWS[::-1]))
+
 
 SCREEN_WIDTH = 640
 SCREEN_HEIGHT = 480
 HALF_SCREEN_HEIGHT = SCREEN_HEIGHT / 2
 HALF_SCREEN_WIDTH = SCREEN_WIDTH / 2
 
-ROTATION_SPEED = 2.5  # rotation speed is defined degrees per frame
-MOVE_SPEED = 0.05  # move speed is defined as squares per frame.
+ROTATION_SPEED = 75  # rotation speed is defined as degrees per second
+MOVE_SPEED = 1.5  # move speed is defined as squares per second.
+COLLISION_RADIUS = 0.25  # how close, in squares, the player and other agents can get to a wall in front of them.
+
+# the game world is updated this many times a second, however quickly frames are drawn.
+# Frames are drawn part way between the last two updates so movement still looks smooth.
+UPDATES_PER_SECOND = 60
+
+# if a frame takes longer than this many seconds, only catch up this much so the game can't fall further and further behind.
+MAX_FRAME_SECONDS = 0.25
 
 SCREEN_SIZE = (SCREEN_WIDTH, SCREEN_HEIGHT)
 
+# draw the view at this fraction of the screen's width and height and scale it up to fill the screen.
+# 1 draws at the full size of the screen. The UI is always drawn at full size.
+RENDER_SCALE = 1.0
+
+# change the render scale as the game runs to keep up with TARGET_FPS, going no lower than MIN_RENDER_SCALE.
+DYNAMIC_RESOLUTION = False
+MIN_RENDER_SCALE = 0.5
+
+# draw walls straight into the screen's pixel array instead of scaling and blitting one column at a time.
+FRAMEBUFFER_RENDERING = True
+
+# split the screen into strips and draw the walls for each strip in its own process.
+# 1 draws everything in this process. Only used with FRAMEBUFFER_RENDERING.
+RENDER_WORKERS = 1
+
+# textures converted to the display's pixel format are kept here so later runs can skip decoding them.
+# None turns the cache off.
+ASSET_CACHE_FOLDER = os.path.join(os.path.expanduser('~'), '.cache', 'pyrayder')
+
+# cast the rays for the next frame on a thread while the current frame is drawn and shown.
+# This shows each frame a frame later than usual, in exchange for drawing more of them.
+PIPELINED_RENDERING = False
+
+# how much memory the blit renderer may use to keep scaled wall columns around between frames.
+COLUMN_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+# draw textured floors, and ceilings over squares that have them, instead of a plain floor color.
+# The textures are ids from assets/manifest.json.
+FLOOR_CASTING = True
+FLOOR_TEXTURE = 'greystone'
+CEILING_TEXTURE = 'wood'
+SKY_TEXTURE = 'sky1'
+
+# fade walls towards the fog color as they get further away. 0 turns fog off.
+# Each fog level adds another shaded copy of every wall texture to the texture atlas.
+FOG_LEVELS = 0
+FOG_DISTANCE = 10  # walls this far away or more are drawn at the thickest fog level.
+FOG_COLOR = colors.BLACK
+
 PLAYER_START_POSITION = Vector2(3, 3)
 PLAYER_START_DIRECTION = Vector2(1, 0)
 
 # 66 degree fov. Length 1 would be a 90 degree fov. Camera plane must be perpendicular to player direction!
 PLAYER_START_CAMERA_PLANE = Vector2(0, -0.66)
 
+
 # store the FOV 
-FOV = abs(math.atan2(PLAYER_START_CAMERA_PLANE.y, PLAYER_START_DIRECTION.length()) * 2)
-FOV_IN_DEGREES = FOV * constants.DEGREES_IN_A_RADIAN
+def _get_fov():
+    return abs(math.atan2(PLAYER_START_CAMERA_PLANE.y, PLAYER_START_DIRECTION.length()) * 2)
+
+
+def _get_fov_in_degrees():
+    return _get_fov() * constants.DEGREES_IN_A_RADIAN
+
+
+# sprites are kept in square buckets this many map squares wide, so only nearby buckets are searched for them.
+SPRITE_BUCKET_SIZE = 8
+
+# skip sprite buckets that can't be seen from where the player is, using an index of which parts of the level
+# can see which. The index errs towards counting things as seen rather than risk skipping a sprite that is drawn.
+# It is built the first time a level is played and saved next to it, see visibility.py.
+SPRITE_VISIBILITY_INDEX = False
+
+# levels with more sprite buckets than this are too slow to build the index for when the game starts,
+# so they only get one if it has been built ahead of time with `python pyrayder pvs`.
+SPRITE_VISIBILITY_MAX_REGIONS = 64
 
 WALL_PALETTE = [colors.BLACK, colors.WHITE, colors.RED, colors.GREEN,
                 colors.BLUE, colors.YELLOW, colors.PURPLE, colors.ORANGE]
+
+
+# settings worked out from other settings. They are only worked out the first time they are read,
+# so importing this module does nothing but assign constants. See __getattr__
+_LAZY_SETTINGS = {
+    'MAP': _get_map,
+    'FOV': _get_fov,
+    'FOV_IN_DEGREES': _get_fov_in_degrees,
+}
+
+
+def __getattr__(name):
+    """work out a lazy setting the first time it is read and keep it, so later reads are ordinary lookups"""
+
+    get_value = _LAZY_SETTINGS.get(name)
+
+    if get_value is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    value = globals()[name] = get_value()
+    return value
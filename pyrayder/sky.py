@@ -0,0 +1,52 @@
+"""This module contains the sky type, which draws a scrolling panorama behind the walls"""
+
+import numpy as np
+import pygame
+
+
+class Sky:
+    """This type scales a sky panorama once and draws the right part of it for the player's rotation"""
+
+    def __init__(self, texture, screen_width, sky_height):
+        self._screen_width = screen_width
+
+        # half of the panorama fits on the screen at once, so scale the whole thing to twice the screen width.
+        # We only ever do this once, so the frame loop never has to rescale anything.
+        self._panorama_width = screen_width * 2
+        panorama = pygame.transform.scale(texture, (self._panorama_width, int(sky_height)))
+
+        # put two copies of the panorama side by side so any window of it we want to draw
+        # can be taken in one piece, even when it wraps around past the end of the image.
+        self._tiled_panorama = pygame.Surface(
+            (self._panorama_width * 2, int(sky_height))).convert()
+        self._tiled_panorama.blit(panorama, (0, 0))
+        self._tiled_panorama.blit(panorama, (self._panorama_width, 0))
+
+        # the same panorama as mapped pixels, stored row by row, made the first time draw_pixels needs it
+        self._panorama_pixels = None
+
+    def _get_window_start(self, player):
+        # use degrees here to avoid a negative value (player radian rotation can be negative)
+        portion = player.get_rotation_degrees() / 360
+
+        # a full turn scrolls through the whole panorama, so the sky joins up seamlessly at 360 degrees.
+        return int(portion * self._panorama_width) % self._panorama_width
+
+    def draw(self, surface, player):
+        """draw the sky onto the top of the surface"""
+
+        window = pygame.Rect(self._get_window_start(player), 0, self._screen_width, self._tiled_panorama.get_height())
+
+        #the sky should be drawn from the top left (x = 0, y = 0)
+        surface.blit(self._tiled_panorama, (0, 0), window)
+
+    def draw_pixels(self, pixels, player):
+        """draw the sky onto the top of an (x, y) array of mapped pixels, such as the one from surfarray.pixels2d"""
+
+        if self._panorama_pixels is None:
+            self._panorama_pixels = np.ascontiguousarray(pygame.surfarray.array2d(self._tiled_panorama).T)
+
+        x_start_pos = self._get_window_start(player)
+        window = self._panorama_pixels[:, x_start_pos:x_start_pos + self._screen_width]
+
+        pixels.T[:window.shape[0]] = window
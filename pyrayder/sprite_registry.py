@@ -0,0 +1,123 @@
+"""This module contains a type that keeps track of where every sprite in the map is"""
+
+from collections import namedtuple
+
+import numpy as np
+from pygame.math import Vector2
+
+import level
+from plotter import Plotter
+from sprite import Sprite
+
+# a sprite the player can see, with how far in front of the player it is and where it is across the screen (-1 to 1)
+VisibleSprite = namedtuple('VisibleSprite', 'sprite depth camera_x')
+
+
+class SpriteRegistry:
+    """This type stores every sprite once and indexes them by position.
+
+    The map is split into square buckets of bucket_size squares and each sprite is kept in the bucket it is in,
+    so finding the sprites the player might see only means looking in the buckets in front of them,
+    no matter how big the map is or how many sprites are in it.
+
+    Given a VisibilityIndex with regions the same size as the buckets, buckets that can't be seen from where
+    the player is standing are skipped as well, even if they are in front of them.
+    """
+
+    def __init__(self, game_level, bucket_size, visibility=None):
+        self._bucket_size = bucket_size
+        self._plotter = Plotter()
+        self._visibility = visibility
+
+        if visibility and visibility.region_size != bucket_size:
+            raise ValueError('the visibility index regions must be the same size as the sprite buckets')
+
+        # (bucket x, bucket y) -> list of sprites in that bucket
+        self._buckets = {}
+
+        # goes up every time a sprite is added, removed or moved, so anything drawn from the sprites knows to redraw
+        self.changes = 0
+
+        for x, y in zip(*np.nonzero(game_level.flag_grid & level.SPRITE)):
+            self.add(Sprite(int(game_level.get_tile(x, y)), Vector2(x + 0.5, y + 0.5), 0))
+
+    def _get_bucket(self, position):
+        return int(position.x // self._bucket_size), int(position.y // self._bucket_size)
+
+    def add(self, sprite):
+        """add a sprite to the registry"""
+        self._buckets.setdefault(self._get_bucket(sprite.map_position), []).append(sprite)
+        self.changes += 1
+
+    def remove(self, sprite):
+        """remove a sprite from the registry"""
+        self._buckets[self._get_bucket(sprite.map_position)].remove(sprite)
+        self.changes += 1
+
+    def move(self, sprite, map_position):
+        """move a sprite, keeping it in the right bucket"""
+        self.remove(sprite)
+        sprite.map_position = map_position
+        self.add(sprite)
+
+    def get_sprites_in_area(self, min_x, min_y, max_x, max_y, visible_buckets=None):
+        """get every sprite in the buckets that overlap an area of the map.
+        visible_buckets is an optional 2D array of bools saying which buckets to look in, indexed [x, y]."""
+
+        min_bucket_x, min_bucket_y = self._get_bucket(Vector2(min_x, min_y))
+        max_bucket_x, max_bucket_y = self._get_bucket(Vector2(max_x, max_y))
+
+        for bucket_x in range(min_bucket_x, max_bucket_x + 1):
+            for bucket_y in range(min_bucket_y, max_bucket_y + 1):
+                sprites = self._buckets.get((bucket_x, bucket_y))
+
+                if sprites and (visible_buckets is None or visible_buckets[bucket_x, bucket_y]):
+                    yield from sprites
+
+    def get_visible_sprites(self, player, view_distance, sprite_width=1):
+        """get the sprites inside the player's view, out to view_distance, sorted furthest away first.
+
+        sprite_width is how wide sprites are in map squares, so sprites partly on screen are kept.
+        """
+
+        # the view is a triangle from the player out to the two edges of the camera plane at view_distance.
+        # Only the buckets touching the box around that triangle can have visible sprites in them.
+        left_edge = player.position + (player.direction - player.camera_plane) * view_distance
+        right_edge = player.position + (player.direction + player.camera_plane) * view_distance
+
+        # buckets hold sprites by their centres, so grow the box by half a sprite on every side,
+        # or sprites just outside the triangle with their edge on screen would pop in and out.
+        padding = sprite_width / 2
+
+        corners = (player.position, left_edge, right_edge)
+        min_x = min(corner.x for corner in corners) - padding
+        min_y = min(corner.y for corner in corners) - padding
+        max_x = max(corner.x for corner in corners) + padding
+        max_y = max(corner.y for corner in corners) + padding
+
+        visible_buckets = None
+
+        if self._visibility:
+            visible_buckets = self._visibility.get_visible_regions(player.position)
+
+        visible_sprites = []
+
+        for sprite in self.get_sprites_in_area(min_x, min_y, max_x, max_y, visible_buckets):
+            depth, camera_x = self._plotter.get_camera_space_position(player, sprite.map_position)
+
+            # skip sprites behind the player or further away than anything we can see
+            if depth <= 0 or depth > view_distance:
+                continue
+
+            # skip sprites completely off the side of the screen, allowing for half the sprite's width
+            half_width = sprite_width / 2 / (depth * player.camera_plane.length())
+            if camera_x + half_width < -1 or camera_x - half_width > 1:
+                continue
+
+            sprite.distance_from_player = (player.position - sprite.map_position).length()
+            visible_sprites.append(VisibleSprite(sprite, depth, camera_x))
+
+        # sort sprites so the ones furthest away are drawn first
+        visible_sprites.sort(key=lambda visible_sprite: visible_sprite.sprite.distance_from_player, reverse=True)
+
+        return visible_sprites
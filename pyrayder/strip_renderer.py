@@ -0,0 +1,137 @@
+"""This module contains a type that draws walls in vertical strips across several processes"""
+
+import multiprocessing
+import signal
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+from pygame.math import Vector2
+
+import framebuffer
+import texture_atlas
+from player import Player
+from ray_caster import RayCaster, RayHits
+
+# everything a worker process needs to draw its strips, set up once when the process starts
+_worker_state = {}
+
+
+def _attach_shared_array(name, shape, dtype):
+    """open a block of shared memory made by another process as a numpy array"""
+
+    memory = shared_memory.SharedMemory(name=name)
+    return memory, np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+
+def _init_worker(game_level, screen_width, texture_memory, framebuffer_memory, fog_levels, fog_distance):
+    """set up a worker process with the map and views onto the shared textures and framebuffer"""
+
+    # workers are forked from the game, so they start with SDL's handlers, which only queue a quit event.
+    # Put the defaults back so the pool can still stop them if they don't shut down when asked to.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    _worker_state['ray_caster'] = RayCaster(game_level, screen_width)
+    _worker_state['textures'] = _attach_shared_array(*texture_memory)
+    _worker_state['framebuffer'] = _attach_shared_array(*framebuffer_memory)
+    _worker_state['fog'] = (fog_levels, fog_distance)
+
+
+def _draw_strip(first_column, last_column, position, direction, camera_plane):
+    """draw the walls for columns first_column up to (not including) last_column into the shared framebuffer"""
+
+    _, texture_pixels = _worker_state['textures']
+    _, frame = _worker_state['framebuffer']
+
+    player = Player(Vector2(position), Vector2(direction), Vector2(camera_plane))
+
+    hits = _worker_state['ray_caster'].cast(
+        player, texture_pixels.shape[2], slice(first_column, last_column))
+
+    shades = texture_atlas.get_shades(hits.side, hits.perceptual_wall_distance, *_worker_state['fog'])
+
+    # the framebuffer is stored row by row like the screen, so flip it round to the (x, y) layout framebuffer expects
+    framebuffer.draw_wall_columns(frame.T, hits, texture_pixels, shades, first_column)
+
+    return hits
+
+
+class StripRenderer:
+    """This type splits the screen into vertical strips and draws the walls for each strip in a pool of processes.
+
+    The textures and the framebuffer live in shared memory, so the worker processes can read and write them
+    without anything being copied between processes apart from the player's position and the walls hit.
+    The result is exactly the same as drawing the walls in one process.
+    """
+
+    def __init__(self, game_level, texture_atlas, screen_width, screen_height, workers):
+        self._shared_memory = []
+
+        try:
+            texture_memory, self._texture_pixels = self._create_shared_array(
+                texture_atlas.pixels.shape, texture_atlas.pixels.dtype)
+            self._texture_pixels[:] = texture_atlas.pixels
+
+            framebuffer_memory, self._framebuffer = self._create_shared_array(
+                (screen_height, screen_width), texture_atlas.pixels.dtype)
+
+            self._pool = multiprocessing.Pool(
+                workers, _init_worker,
+                (game_level, screen_width, texture_memory, framebuffer_memory,
+                 texture_atlas.fog_levels, texture_atlas.fog_distance))
+        except BaseException:
+            self._free_shared_memory()
+            raise
+
+        # split the screen into one strip per worker
+        strip_edges = np.linspace(0, screen_width, workers + 1).astype(int).tolist()
+        self._strips = list(zip(strip_edges[:-1], strip_edges[1:]))
+
+    def _create_shared_array(self, shape, dtype):
+        """make a numpy array in shared memory and return what other processes need to find it, and the array"""
+
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        memory = shared_memory.SharedMemory(create=True, size=size)
+        self._shared_memory.append(memory)
+
+        return (memory.name, shape, dtype), np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+    def draw_walls(self, pixels, player):
+        """draw the walls into an (x, y) array of mapped pixels and return what every column hit as RayHits"""
+
+        # start from whatever has already been drawn (the floor and sky) so the walls go on top of it
+        np.copyto(self._framebuffer, pixels.T)
+
+        pose = (tuple(player.position), tuple(player.direction), tuple(player.camera_plane))
+        strip_hits = self._pool.starmap(_draw_strip, [strip + pose for strip in self._strips])
+
+        np.copyto(pixels.T, self._framebuffer)
+
+        return RayHits(*(np.concatenate(values) for values in zip(*strip_hits)))
+
+    def close(self, timeout=5):
+        """Stop the worker processes and free the shared memory.
+        Workers finish what they are doing and exit, and any still running after timeout seconds are terminated."""
+
+        try:
+            self._pool.close()
+
+            # Pool.join can't time out, so wait for it on another thread
+            joiner = threading.Thread(target=self._pool.join, daemon=True)
+            joiner.start()
+            joiner.join(timeout)
+
+            if joiner.is_alive():
+                self._pool.terminate()
+        finally:
+            self._free_shared_memory()
+
+    def _free_shared_memory(self):
+        # drop our own views first, as shared memory can't be closed while anything still points into it
+        self._texture_pixels = self._framebuffer = None
+
+        while self._shared_memory:
+            memory = self._shared_memory.pop()
+            memory.close()
+            memory.unlink()
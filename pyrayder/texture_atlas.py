@@ -0,0 +1,87 @@
+"""This module contains a type that stores every shaded variant of a set of textures"""
+
+import numpy as np
+import pygame
+
+import colors
+import framebuffer
+from side import Side
+
+
+class TextureAtlas:
+    """This type stores pre-shaded copies of a set of textures so nothing has to be darkened while drawing.
+
+    Every texture gets a copy for each shade. Shade 0 is the texture as it was loaded and shade 1
+    is the darker version used for left or right sides of walls. If fog is turned on, each fog level
+    adds another lit and dark pair, each one fading further towards the fog color.
+    """
+
+    def __init__(self, textures, fog_levels=0, fog_distance=1, fog_color=colors.BLACK):
+        self.fog_levels = fog_levels
+        self.fog_distance = fog_distance
+
+        # surfaces[shade][texture index]
+        self.surfaces = []
+
+        for fog_level in range(fog_levels + 1):
+            # each fog level covers the texture with a little more of the fog color (255 is max)
+            fog_alpha = int(255 * fog_level / (fog_levels + 1))
+
+            for darken in (False, True):
+                shaded_textures = []
+
+                for texture in textures:
+                    # converting makes a copy in the display's pixel format, which is also what the pixels array needs.
+                    shaded_texture = texture.convert()
+                    self._blend(shaded_texture, fog_color, fog_alpha)
+
+                    # we drop the brightness of left and right sides in half, rounding the same way
+                    # covering the loaded texture in black at 128 out of 255 does, see framebuffer.get_darken_table.
+                    if darken:
+                        rgb = pygame.surfarray.pixels3d(shaded_texture)
+                        framebuffer.darken(rgb)
+                        del rgb
+
+                    shaded_textures.append(shaded_texture)
+
+                self.surfaces.append(shaded_textures)
+
+        # the same textures as mapped pixel values in an (shade, index, x, y) array so they can be sampled in bulk.
+        # All the textures must be the same size for this to work.
+        self.pixels = np.array([[pygame.surfarray.array2d(texture) for texture in shaded_textures]
+                                for shaded_textures in self.surfaces]).astype(np.uint32)
+
+        self.texture_width = textures[0].get_width()
+        self.texture_height = textures[0].get_height()
+
+    def _blend(self, surface, color, alpha):
+        """cover a surface with a color at the given strength"""
+
+        if alpha == 0:
+            return
+
+        # we create a new rectangle with the same dimensions as the texture
+        mask = pygame.Surface(surface.get_size())
+        mask.fill(color)
+        mask.set_alpha(alpha)
+
+        # Apply the mask to the original surface from its origin (x:0, y:0)
+        surface.blit(mask, (0, 0))
+
+    def get_shades(self, sides, distances):
+        """get the shade to draw each wall with from arrays of the sides hit and their distances"""
+
+        return get_shades(sides, distances, self.fog_levels, self.fog_distance)
+
+
+def get_shades(sides, distances, fog_levels, fog_distance):
+    """get the shade to draw each wall with, for code that only has the atlas pixels and not the atlas itself"""
+
+    # lit shades are even and the dark shades for left or right sides are odd.
+    shades = (sides == Side.LeftOrRight.value).astype(np.intp)
+
+    if fog_levels:
+        fog_level = np.minimum((distances * (fog_levels / fog_distance)).astype(np.intp), fog_levels)
+        shades += fog_level * 2
+
+    return shades
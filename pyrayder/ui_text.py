@@ -0,0 +1,72 @@
+"""This module contains types for drawing UI text without rendering it from scratch every frame"""
+
+from functools import lru_cache
+
+import pygame
+
+# the characters needed to draw numbers and timings, see GlyphAtlas
+NUMBER_CHARACTERS = '0123456789.-ms'
+
+
+@lru_cache(maxsize=None)
+def get_font(size, name=None):
+    """Load a system font once and hand back the same font every time after that.
+    No name gives pygame's own font.
+
+    pygame.font must be initialised before calling this.
+    """
+
+    # looking for system fonts means asking the OS for every font it has, which can take a good part of a second.
+    # pygame's own font is what SysFont would give back anyway, so skip the search when that is all we want.
+    if name is None:
+        return pygame.font.Font(None, size)
+
+    return pygame.font.SysFont(name, size)
+
+
+class TextCache:
+    """This type keeps rendered lines of text so they are only rendered again when their text changes.
+
+    Each line of text has a slot, such as 'fps', so the cache never holds more than one surface per slot.
+    """
+
+    def __init__(self, font, color):
+        self._font = font
+        self._color = color
+
+        # slot -> (text, rendered text)
+        self._lines = {}
+
+    def get(self, slot, text):
+        """get a surface with the text rendered on it, rendering it only if the slot's text has changed"""
+
+        line = self._lines.get(slot)
+
+        if line is None or line[0] != text:
+            line = (text, self._font.render(text, True, self._color))
+            self._lines[slot] = line
+
+        return line[1]
+
+
+class GlyphAtlas:
+    """This type renders a small set of characters once and draws text by blitting those glyphs.
+
+    This is for text that changes every frame, like numbers, where caching whole lines would never hit.
+    Every character drawn must be one of the characters the atlas was made with.
+    """
+
+    def __init__(self, font, color, characters=NUMBER_CHARACTERS):
+        self._glyphs = {character: font.render(character, True, color) for character in characters}
+
+    def draw(self, surface, text, position):
+        """draw text onto a surface with its top left at position, returning the width drawn in pixels"""
+
+        x, y = position
+
+        for character in text:
+            glyph = self._glyphs[character]
+            surface.blit(glyph, (x, y))
+            x += glyph.get_width()
+
+        return x - position[0]
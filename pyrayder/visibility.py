@@ -0,0 +1,278 @@
+"""This module contains a precomputed index of which parts of a level can possibly be seen from which others"""
+
+import hashlib
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+import level
+import settings
+
+# bump this whenever the way the index is built changes, so indexes saved by older versions get rebuilt
+_VERSION = 2
+
+# starting each angle's lines this fraction of the spacing further across than the last spreads them out evenly
+_GOLDEN_RATIO = 0.6180339887498949
+
+
+def _get_level_hash(game_level, region_size):
+    key = repr((_VERSION, region_size, game_level.width, game_level.height)).encode()
+    return hashlib.sha1(key + np.ascontiguousarray(game_level.flags).tobytes()).hexdigest()
+
+
+def get_region_count(game_level, region_size):
+    """get how many regions a level is split into for a region size"""
+    return -(-game_level.width // region_size) * -(-game_level.height // region_size)
+
+
+class VisibilityIndex:
+    """This type is a potentially visible set: for each region of the map, every region that might be seen from it.
+
+    The map is split into square regions of region_size squares. Two points can see each other if the line between
+    them doesn't pass through a wall, so the index is built by casting lines right across the map in every direction,
+    line_spacing squares apart, and marking every region along each open stretch of a line between two walls as seen
+    from every other region along it. Every line through a region is used, not just the ones that start in it,
+    so far fewer lines are needed than casting rays out of each region in turn would take.
+
+    The lines are only a sample of every line there is, so to be sure nothing is missed the index is generous.
+    Lines are line_spacing apart both side by side and, as they turn, at the far side of the map, and everything
+    next to a region that is seen is counted as seen too. With lines a quarter of a square apart, no sprite the
+    renderer draws has been culled in thousands of views of open levels and of levels split into rooms,
+    see tests/test_visibility.py.
+
+    visible holds a row of bits for each region, packed eight to a byte with np.packbits, saying which regions can
+    be seen from it. That is an eighth of the memory of a table of bools, and only one row is ever unpacked at once.
+
+    Building it follows millions of points along the lines, which takes a second or two on small levels and
+    minutes on big ones, and the level never changes, so it is built once and saved, see load_visibility_index.
+    """
+
+    def __init__(self, visible, region_size, regions_x, regions_y):
+        # visible[from region] is the packed bits of every region it can see, regions numbered x * regions_y + y
+        self.visible = visible
+        self.region_size = region_size
+        self.regions_x = regions_x
+        self.regions_y = regions_y
+
+        # the player stays in the same region for many frames, so keep the last answer of get_visible_regions
+        self._last_region = None
+        self._last_visible = None
+
+    @classmethod
+    def build(cls, game_level, region_size, line_spacing=0.25):
+        """cast lines across the level to find which regions can see which"""
+
+        width = game_level.width
+        height = game_level.height
+        regions_x = -(-width // region_size)
+        regions_y = -(-height // region_size)
+        region_count = regions_x * regions_y
+
+        # the region each square is in, or -1 for walls, with a border of -1 all round wide enough
+        # that every point looked at is inside it, so points off the map need no checks of their own
+        border = int(np.ceil(np.hypot(width, height) / 2)) + 1
+        region_x, region_y = np.meshgrid(np.arange(width) // region_size, np.arange(height) // region_size,
+                                         indexing='ij')
+        regions = np.full((width + 2 * border, height + 2 * border), -1, dtype=np.int32)
+        regions[border:border + width, border:border + height] = np.where(
+            game_level.flag_grid & level.WALL, -1, region_x * regions_y + region_y)
+
+        seen = np.zeros((region_count, region_count), dtype=bool)
+
+        # turning the lines by one step moves them no more than line_spacing squares, even at the far side of the map
+        angle_count = int(np.ceil(np.pi * np.hypot(width, height) / line_spacing))
+
+        for angle in range(angle_count):
+            # each angle starts its lines a different fraction of line_spacing across, so between them
+            # the lines cross the map at many more places than any one angle does
+            offset = angle * _GOLDEN_RATIO % 1 * line_spacing
+
+            cls._mark_lines(seen, regions, border, width, height, (angle + 0.5) / angle_count * np.pi,
+                            offset, line_spacing)
+
+        # any region that can be stood in can see itself
+        open_regions = np.unique(regions[regions >= 0])
+        seen[open_regions, open_regions] = True
+
+        spread = cls._spread(seen.reshape(region_count, regions_x, regions_y))
+        visible = np.packbits(spread.reshape(region_count, region_count), axis=1)
+
+        return cls(visible, region_size, regions_x, regions_y)
+
+    @staticmethod
+    def _spread(grids):
+        """Lines are only a sample, and a line can pass through the corner of a region between the points looked at
+        along it, so a region that only just peeks into view could have been missed. Anything next to a region that
+        can be seen might be seen too. Spreads each grid of regions in an array of them, indexed [..., x, y]."""
+
+        spread = grids.copy()
+        spread[..., 1:, :] |= grids[..., :-1, :]
+        spread[..., :-1, :] |= grids[..., 1:, :]
+        grids = spread.copy()
+        spread[..., 1:] |= grids[..., :-1]
+        spread[..., :-1] |= grids[..., 1:]
+
+        return spread
+
+    @staticmethod
+    def _mark_lines(seen, regions, border, width, height, angle, offset, line_spacing):
+        """mark the regions along each open stretch of a set of parallel lines across the map as seeing each other"""
+
+        direction_x, direction_y = float(np.cos(angle)), float(np.sin(angle))
+
+        # how far the map reaches from its middle, along the lines and across them
+        half_length = (abs(direction_x) * width + abs(direction_y) * height) / 2
+        half_breadth = (abs(direction_y) * width + abs(direction_x) * height) / 2
+
+        # where each line crosses the middle of the map, and points half a square apart along the lines that run
+        # a little past the map, so the last point of every line is off it and no open stretch runs on into the next.
+        # Points that far apart can skip the corner of a wall, which only ever lets a line see more, never less.
+        across = np.arange(offset - half_breadth, half_breadth, line_spacing, dtype=np.float32)
+        along = np.arange(-half_length, half_length + 1, 0.5, dtype=np.float32)
+
+        # the square of the map, with its border, that each point is in
+        x = ((border + width / 2 - across * direction_y)[:, np.newaxis] + along * direction_x).astype(np.int32)
+        y = ((border + height / 2 + across * direction_x)[:, np.newaxis] + along * direction_y).astype(np.int32)
+        point_regions = regions.ravel()[(x * regions.shape[1] + y).ravel()]
+
+        # only look at the points where a line goes into another region, or out of a wall into the open
+        previous_regions = np.roll(point_regions, 1)
+        changes = np.flatnonzero((point_regions != previous_regions) & (point_regions >= 0))
+
+        if not changes.size:
+            return
+
+        # the regions along each open stretch, in order, and which stretch they are in
+        stretch_regions = point_regions[changes]
+        stretches = np.cumsum(previous_regions[changes] < 0) - 1
+        stretch_starts = np.flatnonzero(np.diff(stretches, prepend=-1))
+        stretch_lengths = np.diff(stretch_starts, append=stretches.size)
+
+        # every region in a stretch sees every region in it, itself included
+        pair_counts = stretch_lengths[stretches]
+        firsts = np.repeat(np.arange(stretches.size), pair_counts)
+        pair_starts = np.repeat(np.cumsum(pair_counts) - pair_counts, pair_counts)
+        seconds = np.repeat(stretch_starts[stretches], pair_counts) + np.arange(firsts.size) - pair_starts
+
+        seen[stretch_regions[firsts], stretch_regions[seconds]] = True
+
+    def get_region(self, position):
+        """get the number of the region a position is in"""
+
+        region_x = min(max(int(position.x // self.region_size), 0), self.regions_x - 1)
+        region_y = min(max(int(position.y // self.region_size), 0), self.regions_y - 1)
+
+        return region_x * self.regions_y + region_y
+
+    def get_visible_regions(self, position):
+        """Get which regions might be seen from a position, as a 2D array of bools indexed [region x, region y].
+        Treat it as read only, it is shared until the position moves into another region."""
+
+        region = self.get_region(position)
+
+        if region != self._last_region:
+            visible = np.unpackbits(self.visible[region], count=self.regions_x * self.regions_y).astype(bool)
+
+            self._last_visible = visible.reshape(self.regions_x, self.regions_y)
+            self._last_region = region
+
+        return self._last_visible
+
+    def save(self, path, level_hash):
+        """save the index, along with a hash of the level it was built for"""
+
+        # write it to another file and move that into place, so a game closed part way through saving
+        # can't leave half an index behind
+        file, temporary_path = tempfile.mkstemp(suffix='.npz', dir=os.path.dirname(path) or '.')
+
+        try:
+            with os.fdopen(file, 'wb') as index_file:
+                np.savez(index_file, visible=self.visible, level_hash=level_hash,
+                         shape=(self.region_size, self.regions_x, self.regions_y))
+
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+    @classmethod
+    def load(cls, path, level_hash):
+        """load a saved index, or return None if it was built for a different level"""
+
+        with np.load(path) as saved:
+            if str(saved['level_hash']) != level_hash:
+                return None
+
+            region_size, regions_x, regions_y = saved['shape'].tolist()
+
+            return cls(saved['visible'], region_size, regions_x, regions_y)
+
+
+def get_visibility_index_path(game_level, region_size, cache_folder=settings.ASSET_CACHE_FOLDER):
+    """Get where the visibility index of a level is saved, or None if there is nowhere to save it.
+    Levels loaded from a file keep their index next to the file, anything else keeps it in the cache folder."""
+
+    if game_level.path:
+        return f'{game_level.path}.pvs{region_size}.npz'
+
+    if cache_folder:
+        return os.path.join(cache_folder, f'level-{_get_level_hash(game_level, region_size)[:16]}.pvs{region_size}.npz')
+
+    return None
+
+
+def load_visibility_index(game_level, region_size, cache_folder=settings.ASSET_CACHE_FOLDER,
+                          max_regions=settings.SPRITE_VISIBILITY_MAX_REGIONS):
+    """Get the visibility index of a level, building it and saving it if it hasn't been saved before.
+
+    Saved indexes are only used if the level and region size are the same as when they were built.
+    Building one for a level of more than max_regions regions would hold up starting the game for too long,
+    so None is returned instead and sprites are culled by their buckets alone. Pass max_regions=None to build
+    it anyway, see save_visibility_index.
+    """
+
+    level_hash = _get_level_hash(game_level, region_size)
+    path = get_visibility_index_path(game_level, region_size, cache_folder)
+
+    if path and os.path.exists(path):
+        try:
+            index = VisibilityIndex.load(path, level_hash)
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            index = None
+
+        if index:
+            return index
+
+    if max_regions is not None and get_region_count(game_level, region_size) > max_regions:
+        return None
+
+    index = VisibilityIndex.build(game_level, region_size)
+
+    # the index only saves time, so if it can't be written just carry on without it
+    if path:
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            index.save(path, level_hash)
+        except OSError:
+            pass
+
+    return index
+
+
+def save_visibility_index(game_level, region_size, cache_folder=settings.ASSET_CACHE_FOLDER):
+    """build the visibility index of a level of any size ahead of time and save it where the game will find it.
+    Returns where it was saved."""
+
+    path = get_visibility_index_path(game_level, region_size, cache_folder)
+
+    if not path:
+        raise ValueError('the level has no file and there is no cache folder to save its visibility index in')
+
+    index = VisibilityIndex.build(game_level, region_size)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    index.save(path, _get_level_hash(game_level, region_size))
+
+    return path
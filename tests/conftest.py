@@ -0,0 +1,36 @@
+"""Shared set up for the tests. The game's modules import each other by name, so its folder goes on the path"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pyrayder'))
+
+# run without opening a window
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame  # noqa: E402
+
+import settings  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def display():
+    """start pygame's display with a window the size of the screen, which textures need to be converted"""
+
+    pygame.display.init()
+    pygame.font.init()
+
+    yield pygame.display.set_mode(settings.SCREEN_SIZE)
+
+    pygame.quit()
+
+
+@pytest.fixture
+def assets(display):
+    """an asset manager that doesn't read or write the texture cache"""
+
+    import asset_loader
+
+    return asset_loader.AssetManager(cache_folder=None)
@@ -0,0 +1,30 @@
+"""Check the texture cache never stops the game from starting"""
+
+import os
+
+import pygame
+
+import asset_loader
+
+
+def test_damaged_cache_falls_back_to_the_image(display, tmp_path):
+    texture_id = asset_loader.AssetManager(cache_folder=None).get_group('walls')[0]
+
+    expected = pygame.surfarray.array2d(asset_loader.AssetManager(cache_folder=str(tmp_path)).get_texture(texture_id))
+    cache_files = os.listdir(tmp_path)
+
+    # only the finished cache file is left behind
+    assert len(cache_files) == 1 and cache_files[0].startswith(texture_id)
+
+    # cut the file short, like a run killed while writing it
+    cache_path = tmp_path / cache_files[0]
+    cache_path.write_bytes(cache_path.read_bytes()[:200])
+
+    texture = asset_loader.AssetManager(cache_folder=str(tmp_path)).get_texture(texture_id)
+
+    assert (pygame.surfarray.array2d(texture) == expected).all()
+
+    # the damaged file was replaced with a good one, which the next run loads from
+    assert os.listdir(tmp_path) == cache_files
+    texture = asset_loader.AssetManager(cache_folder=str(tmp_path)).get_texture(texture_id)
+    assert (pygame.surfarray.array2d(texture) == expected).all()
@@ -0,0 +1,86 @@
+"""Check frames still look like they did before any of the speed ups.
+
+The images in data/ were drawn by the original renderer, which drew the floor, the sky and then one wall column at
+a time with pygame.transform.scale and a blit, darkening left and right sides by blitting black over them.
+That renderer drew the settings.MAP of the time, which had no sprites or ceilings, so the same map is used here.
+"""
+
+import os
+
+import numpy as np
+import pygame
+import pytest
+from pygame.math import Vector2
+
+import level
+import settings
+from player import Player
+from renderer import Renderer
+from side import Side
+
+DATA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+# settings.MAP as it was, before it is turned to be indexed [x][y]
+MAP_ROWS = (
+    (1, 1, 1, 1, 1, 1, 1, 1, 1, 1),
+    (1, 2, 0, 0, 0, 0, 0, 0, 0, 1),
+    (1, 0, 0, 0, 0, 3, 0, 0, 0, 1),
+    (1, 0, 0, 0, 0, 0, 0, 0, 0, 1),
+    (1, 0, 0, 0, 2, 3, 0, 0, 0, 1),
+    (1, 0, 0, 0, 5, 6, 0, 0, 0, 1),
+    (1, 0, 0, 0, 0, 0, 0, 0, 0, 1),
+    (1, 0, 0, 0, 0, 0, 0, 0, 4, 1),
+    (1, 3, 3, 0, 0, 0, 0, 0, 4, 1),
+    (1, 1, 1, 1, 1, 1, 1, 1, 1, 1),
+)
+
+
+@pytest.fixture(params=[True, False], ids=['framebuffer', 'blit'])
+def renderer(request, assets, monkeypatch):
+    # the original renderer had a flat floor and drew the walls in one process
+    monkeypatch.setattr(settings, 'FLOOR_CASTING', False)
+    monkeypatch.setattr(settings, 'RENDER_WORKERS', 1)
+    monkeypatch.setattr(settings, 'FRAMEBUFFER_RENDERING', request.param)
+
+    renderer = Renderer(level.Level.from_grid(tuple(zip(*MAP_ROWS[::-1]))), assets=assets)
+    yield renderer
+    renderer.close()
+
+
+def _draw(renderer, position, rotation):
+    player = Player(Vector2(position), Vector2(settings.PLAYER_START_DIRECTION),
+                    Vector2(settings.PLAYER_START_CAMERA_PLANE))
+    player.rotate(rotation)
+
+    # everything but the debug text, which the original images were drawn without
+    for name, draw_stage, arguments in renderer.get_stages(player, settings.TARGET_FPS):
+        if name != 'ui':
+            draw_stage(*arguments)
+
+    return pygame.surfarray.array3d(renderer.SCREEN)
+
+
+def _load(name):
+    return pygame.surfarray.array3d(pygame.image.load(os.path.join(DATA_FOLDER, name)))
+
+
+def test_start_matches_baseline(renderer):
+    np.testing.assert_array_equal(_draw(renderer, (3, 3), 0), _load('baseline_start.png'))
+
+
+def test_dark_sides_match_baseline(renderer):
+    # looking at the dark sides of a texture full of odd color values, which are the easiest to round differently
+    frame = _draw(renderer, (6.5, 5.5), 135)
+    baseline = _load('baseline_stone.png')
+
+    # the sky now scrolls the whole panorama around a full turn, so it is in a different place to the original.
+    # Compare the walls, worked out the same way as the renderers do, and the floor.
+    height = renderer.render_height
+    line_heights = (height / renderer.g_buffer.perceptual_wall_distance).astype(int)
+    draw_start = (height / 2 - line_heights / 2).astype(int)
+    rows = np.arange(height)
+    is_wall = (rows >= draw_start[:, np.newaxis]) & (rows < (draw_start + line_heights)[:, np.newaxis])
+    is_wall[:, height // 2:] = True
+
+    np.testing.assert_array_equal(frame[is_wall], baseline[is_wall])
+    assert np.count_nonzero(renderer.g_buffer.side == Side.LeftOrRight.value) > renderer.render_width // 4
@@ -0,0 +1,67 @@
+"""Check levels survive being saved and loaded"""
+
+import numpy as np
+import pytest
+
+import level
+
+
+def _assert_same_level(loaded, game_level):
+    assert (loaded.width, loaded.height) == (game_level.width, game_level.height)
+    np.testing.assert_array_equal(loaded.tiles, game_level.tiles)
+    np.testing.assert_array_equal(loaded.flags, game_level.flags)
+
+
+def test_binary_round_trip(tmp_path):
+    game_level = level.generate_level(40, 24, seed=4)
+    path = str(tmp_path / 'level.lvl')
+
+    game_level.save(path)
+    loaded = level.Level.load(path)
+
+    _assert_same_level(loaded, game_level)
+    assert loaded.path == path
+
+    # binary levels are memory mapped rather than read in, and read only
+    assert isinstance(loaded.tiles, np.memmap) and isinstance(loaded.flags, np.memmap)
+    assert not loaded.flags.flags.writeable
+
+    # everything worked out from the map is the same as for the level in memory
+    np.testing.assert_array_equal(loaded.wall_distances, game_level.wall_distances)
+    assert loaded.get_tile(5, 7) == game_level.get_tile(5, 7)
+
+
+def test_text_round_trip(tmp_path):
+    game_level = level.generate_level(12, 9, seed=5)
+    path = tmp_path / 'level.txt'
+
+    # text levels are laid out like settings.MAP, with the top row of the map on the first line
+    path.write_text('\n'.join(' '.join(str(value) for value in row) for row in game_level.grid.T[::-1]))
+
+    _assert_same_level(level.Level.load(str(path)), game_level)
+
+
+def test_flags():
+    game_level = level.Level.from_grid(((0, 3, 10), (11, 0, 0), (0, 0, 0)))
+
+    # the squares round the edge are always walls and nothing else, whatever their map values say
+    assert game_level.get_flags(0, 0) == level.WALL
+    assert game_level.get_flags(0, 1) == level.WALL
+    assert game_level.get_flags(0, 2) == level.WALL
+    assert game_level.get_flags(1, 0) == level.WALL
+    assert game_level.get_flags(1, 1) == level.EMPTY
+
+    # inside the edge, squares are flagged by their map values
+    inner = level.Level.from_grid(np.pad([[0, 10], [11, 3]], 1, constant_values=1))
+    assert inner.get_flags(1, 1) == level.EMPTY
+    assert inner.get_flags(1, 2) == level.EMPTY | level.CEILING
+    assert inner.get_flags(2, 1) == level.SPRITE
+    assert inner.get_flags(2, 2) == level.WALL
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'level.lvl'
+    path.write_bytes(b'not a level at all')
+
+    with pytest.raises(ValueError):
+        level.Level.load(str(path))
@@ -0,0 +1,81 @@
+"""Check agents stop at walls and slide along them"""
+
+import numpy as np
+import pytest
+
+import level
+from movement import Mover
+
+# a 6 x 6 room, indexed [x][y], with an open 4 x 4 middle and a wall sticking out at (3, 2)
+GRID = (
+    (1, 1, 1, 1, 1, 1),
+    (1, 0, 0, 0, 0, 1),
+    (1, 0, 0, 0, 0, 1),
+    (1, 0, 1, 0, 0, 1),
+    (1, 0, 0, 0, 0, 1),
+    (1, 1, 1, 1, 1, 1),
+)
+
+
+@pytest.fixture
+def mover():
+    return Mover(level.Level.from_grid(GRID), radius=0.25)
+
+
+def test_moves_through_open_squares(mover):
+    positions = np.array([[1.5, 1.5]])
+    blocked = mover.move(positions, np.array([[0.2, 0.1]]))
+
+    np.testing.assert_allclose(positions, [[1.7, 1.6]])
+    assert not blocked.any()
+
+
+def test_stops_before_a_wall(mover):
+    # the wall at x = 5 is 0.4 away, so only moves that keep the agent 0.25 from it go through
+    positions = np.array([[4.6, 1.5], [4.6, 2.5]])
+    blocked = mover.move(positions, np.array([[0.1, 0.0], [0.2, 0.0]]))
+
+    np.testing.assert_allclose(positions, [[4.7, 1.5], [4.6, 2.5]])
+    np.testing.assert_array_equal(blocked, [[False, False], [True, False]])
+
+
+def test_slides_along_a_wall(mover):
+    # walking diagonally into the wall at (3, 2) from the left stops in x but carries on in y
+    positions = np.array([[2.7, 2.5]])
+    blocked = mover.move(positions, np.array([[0.1, 0.1]]))
+
+    np.testing.assert_allclose(positions, [[2.7, 2.6]])
+    np.testing.assert_array_equal(blocked, [[True, False]])
+
+
+def test_moves_many_agents_at_once(mover):
+    # agents wandering every which way from a corner of the room never end up inside a wall
+    generator = np.random.default_rng(6)
+    positions = np.tile([[1.5, 1.5]], (500, 1))
+
+    for _ in range(200):
+        mover.move(positions, generator.uniform(-0.2, 0.2, positions.shape))
+
+    assert mover.is_empty(positions).all()
+
+    # and they did get somewhere rather than being stuck where they started
+    assert (positions != 1.5).any(axis=1).all()
+
+
+@pytest.mark.parametrize('direction', [(1, 0), (-1, 0), (0, 1), (0, -1)])
+def test_never_leaves_the_map(direction):
+    # a room with 0s all round its edge. from_grid walls the edge in anyway, and a level whose flags leave the edge
+    # open still can't be walked off, as off the map counts as wall.
+    open_grid = np.zeros((6, 6), dtype=np.uint8)
+    walled = level.Level.from_grid(open_grid)
+    open_edge = level.Level(open_grid.ravel(), np.full(36, level.EMPTY, dtype=np.uint8), 6, 6)
+
+    for game_level, low, high in ((walled, 1.25, 4.75), (open_edge, 0.25, 5.75)):
+        mover = Mover(game_level, radius=0.25)
+        positions = np.tile([[3.0, 3.0]], (50, 1))
+
+        for _ in range(100):
+            mover.move(positions, np.tile(np.multiply(direction, 0.2), (50, 1)))
+
+        assert mover.is_empty(positions).all()
+        assert ((positions >= low) & (positions <= high)).all()
@@ -0,0 +1,84 @@
+"""Check the ray casters hit the walls worked out by hand"""
+
+import numpy as np
+import pytest
+from pygame.math import Vector2
+
+import level
+from player import Player
+from ray_caster import RayCaster, ScalarRayCaster
+from side import Side
+
+TEXTURE_WIDTH = 64
+
+# a 5 x 5 room, indexed [x][y], with a 3 x 3 open middle. Square (4, 2) is map value 3 and (2, 4) is 2,
+# which are textures 2 and 1.
+GRID = (
+    (1, 1, 1, 1, 1),
+    (1, 0, 0, 0, 1),
+    (1, 0, 0, 0, 2),
+    (1, 0, 0, 0, 1),
+    (1, 1, 3, 1, 1),
+)
+
+
+def _cast(ray_caster_type, player):
+    # 4 columns have camera x -1, -0.5, 0 and 0.5, see Plotter
+    return ray_caster_type(level.Level.from_grid(GRID), 4).cast(player, TEXTURE_WIDTH)
+
+
+@pytest.fixture(params=[RayCaster, ScalarRayCaster])
+def ray_caster_type(request):
+    return request.param
+
+
+def test_facing_along_x(ray_caster_type):
+    # standing in the middle of the room looking at the right hand wall
+    hits = _cast(ray_caster_type, Player(Vector2(2.5, 2.5), Vector2(1, 0), Vector2(0, -0.66)))
+
+    # column 2 looks straight ahead and hits the left side of (4, 2) half way along, 1.5 squares away.
+    # Left sides are drawn flipped, so the middle of the wall is column 63 - 32 of the texture.
+    assert hits.map_x[2] == 4 and hits.map_y[2] == 2
+    assert hits.side[2] == Side.LeftOrRight.value
+    assert hits.texture_index[2] == 2
+    assert hits.perceptual_wall_distance[2] == pytest.approx(1.5)
+    assert hits.texture_x[2] == 31
+
+    # column 0 looks along (1, 0.66). It reaches x = 4 after 1.5 squares at y = 2.5 + 0.99, in square (4, 3)
+    assert hits.map_x[0] == 4 and hits.map_y[0] == 3
+    assert hits.side[0] == Side.LeftOrRight.value
+    assert hits.texture_index[0] == 0
+    assert hits.perceptual_wall_distance[0] == pytest.approx(1.5)
+    assert hits.texture_x[0] == TEXTURE_WIDTH - 1 - int(0.49 * TEXTURE_WIDTH)
+
+
+def test_facing_along_y(ray_caster_type):
+    # standing near the bottom of the room looking up at the top wall
+    hits = _cast(ray_caster_type, Player(Vector2(2.5, 1.25), Vector2(0, 1), Vector2(0.66, 0)))
+
+    # column 2 looks straight up and hits the bottom side of (2, 4), 2.75 squares away
+    assert hits.map_x[2] == 2 and hits.map_y[2] == 4
+    assert hits.side[2] == Side.TopOrBottom.value
+    assert hits.texture_index[2] == 1
+    assert hits.perceptual_wall_distance[2] == pytest.approx(2.75)
+    assert hits.texture_x[2] == 32
+
+    # column 0 looks along (-0.66, 1). It reaches the left wall at x = 1 after 1.5 / 0.66 squares,
+    # at y = 1.25 + 2.27, before it gets anywhere near the top wall
+    assert hits.map_x[0] == 0 and hits.map_y[0] == 3
+    assert hits.side[0] == Side.LeftOrRight.value
+    assert hits.perceptual_wall_distance[0] == pytest.approx(1.5 / 0.66)
+
+
+def test_ray_casters_agree():
+    game_level = level.generate_level(32, 32, wall_fraction=0.2, seed=3)
+    player = Player(Vector2(16.5, 16.5), Vector2(1, 0), Vector2(0, -0.66))
+    player.rotate(33)
+
+    hits = RayCaster(game_level).cast(player, TEXTURE_WIDTH)
+    reference = ScalarRayCaster(game_level).cast(player, TEXTURE_WIDTH)
+
+    for field in ('side', 'map_x', 'map_y', 'texture_index', 'texture_x'):
+        np.testing.assert_array_equal(getattr(hits, field), getattr(reference, field))
+
+    np.testing.assert_allclose(hits.perceptual_wall_distance, reference.perceptual_wall_distance, rtol=1e-9)
@@ -0,0 +1,70 @@
+"""Check the worker processes draw the same walls as one process, and always shut down"""
+
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+from pygame.math import Vector2
+
+import asset_loader
+import framebuffer
+import level
+from player import Player
+from ray_caster import RayCaster
+from strip_renderer import StripRenderer
+
+WIDTH = 96
+HEIGHT = 64
+
+# how long the workers get to start, draw and stop before the test fails rather than hanging
+TIMEOUT_SECONDS = 30
+
+
+def _run_with_timeout(function):
+    thread = threading.Thread(target=function, daemon=True)
+    thread.start()
+    thread.join(TIMEOUT_SECONDS)
+
+    assert not thread.is_alive(), f'{function.__name__} did not finish within {TIMEOUT_SECONDS} seconds'
+
+
+def test_draws_like_one_process_and_shuts_down(assets):
+    game_level = level.generate_level(24, 24, wall_fraction=0.15, seed=7)
+    texture_atlas = asset_loader.get_texture_atlas(assets.get_textures(assets.get_group('walls')))
+    player = Player(Vector2(12.5, 12.5), Vector2(1, 0), Vector2(0, -0.66))
+    player.rotate(20)
+
+    hits = RayCaster(game_level, WIDTH).cast(player, texture_atlas.texture_width)
+    expected = np.zeros((WIDTH, HEIGHT), dtype=np.uint32)
+    framebuffer.draw_wall_columns(expected, hits, texture_atlas.pixels,
+                                  texture_atlas.get_shades(hits.side, hits.perceptual_wall_distance))
+
+    results = {}
+
+    def start():
+        results['strip_renderer'] = StripRenderer(game_level, texture_atlas, WIDTH, HEIGHT, 2)
+
+    _run_with_timeout(start)
+    strip_renderer = results['strip_renderer']
+    memory_names = [memory.name for memory in strip_renderer._shared_memory]
+
+    try:
+        def draw():
+            results['pixels'] = np.zeros((WIDTH, HEIGHT), dtype=np.uint32)
+            results['hits'] = strip_renderer.draw_walls(results['pixels'], player)
+
+        _run_with_timeout(draw)
+    finally:
+        _run_with_timeout(strip_renderer.close)
+
+    np.testing.assert_array_equal(results['pixels'], expected)
+    np.testing.assert_array_equal(results['hits'].map_x, hits.map_x)
+
+    # the shared memory has gone with the workers
+    for name in memory_names:
+        try:
+            shared_memory.SharedMemory(name=name).close()
+        except FileNotFoundError:
+            continue
+
+        raise AssertionError(f'shared memory {name} was left behind')
@@ -0,0 +1,110 @@
+"""Check the visibility index never culls a sprite the renderer would have drawn"""
+
+import numpy as np
+import pytest
+from pygame.math import Vector2
+
+import level
+import settings
+import visibility
+from player import Player
+from plotter import Plotter
+from ray_caster import RayCaster
+from sprite_registry import SpriteRegistry
+
+BUCKET_SIZE = 8
+POSES = 300
+
+
+def _get_rooms_level(seed):
+    # 6 x 6 rooms of 7 x 7 squares, each with a one square door into the rooms above and to the right of it,
+    # and sprites in a quarter of the open squares
+    random = np.random.default_rng(seed)
+    grid = np.zeros((49, 49), dtype=np.uint8)
+    grid[::8] = 1
+    grid[:, ::8] = 1
+
+    for room in range(6):
+        for door in range(5):
+            grid[room * 8 + random.integers(1, 8), door * 8 + 8] = 0
+            grid[door * 8 + 8, room * 8 + random.integers(1, 8)] = 0
+
+    grid[(grid == 0) & (random.random(grid.shape) < 0.25)] = 11
+
+    return level.Level.from_grid(grid)
+
+
+def _get_open_level(seed):
+    # walls scattered thinly enough that there are long views across the level through narrow gaps
+    random = np.random.default_rng(seed)
+    squares = random.random((96, 96))
+    grid = np.where(squares < 0.1, 1, 0).astype(np.uint8)
+    grid[squares > 0.7] = 11
+
+    return level.Level.from_grid(grid)
+
+
+def _get_drawn_sprites(sprite_registry, plotter, player, wall_distances):
+    # the sprites that have a column in front of the walls, worked out the same way as Renderer._draw_sprite
+    drawn = set()
+
+    for visible_sprite in sprite_registry.get_visible_sprites(player, wall_distances.max()):
+        width = plotter.get_object_size_based_on_distance(visible_sprite.depth)
+        left = int((visible_sprite.camera_x + 1) * settings.SCREEN_WIDTH / 2) - width // 2
+        columns = wall_distances[max(left, 0):max(left + width, 0)]
+
+        if (columns > visible_sprite.depth).any():
+            drawn.add(tuple(visible_sprite.sprite.map_position))
+
+    return drawn
+
+
+@pytest.mark.parametrize('get_level, seed', [(_get_rooms_level, 1), (_get_rooms_level, 2), (_get_open_level, 3)])
+def test_culls_nothing_that_is_drawn(get_level, seed):
+    game_level = get_level(seed)
+    index = visibility.VisibilityIndex.build(game_level, BUCKET_SIZE)
+
+    every_sprite = SpriteRegistry(game_level, BUCKET_SIZE)
+    culled = SpriteRegistry(game_level, BUCKET_SIZE, index)
+    ray_caster = RayCaster(game_level)
+    plotter = Plotter()
+
+    random = np.random.default_rng(seed)
+    open_squares = np.argwhere((game_level.flag_grid & level.WALL) == 0)
+    drawn_count = 0
+
+    for x, y in open_squares[random.integers(len(open_squares), size=POSES)]:
+        player = Player(Vector2(x + random.uniform(0.25, 0.75), y + random.uniform(0.25, 0.75)),
+                        Vector2(settings.PLAYER_START_DIRECTION), Vector2(settings.PLAYER_START_CAMERA_PLANE))
+        player.rotate(random.uniform(0, 360))
+
+        wall_distances = ray_caster.cast(player, 64).perceptual_wall_distance
+        drawn = _get_drawn_sprites(every_sprite, plotter, player, wall_distances)
+
+        assert _get_drawn_sprites(culled, plotter, player, wall_distances) == drawn
+
+        drawn_count += len(drawn)
+
+    # there was plenty to see, and with rooms in the way most of the level can't be seen from any one room
+    assert drawn_count > POSES
+
+    if get_level is _get_rooms_level:
+        region_count = index.regions_x * index.regions_y
+        assert np.unpackbits(index.visible, axis=1, count=region_count).mean() < 0.5
+
+
+def test_damaged_index_is_rebuilt(tmp_path):
+    game_level = _get_rooms_level(1)
+    index = visibility.load_visibility_index(game_level, BUCKET_SIZE, cache_folder=str(tmp_path))
+    path = visibility.get_visibility_index_path(game_level, BUCKET_SIZE, cache_folder=str(tmp_path))
+
+    # cut the file short, like a game closed while saving it
+    with open(path, 'r+b') as index_file:
+        index_file.truncate(100)
+
+    rebuilt = visibility.load_visibility_index(game_level, BUCKET_SIZE, cache_folder=str(tmp_path))
+
+    np.testing.assert_array_equal(rebuilt.visible, index.visible)
+    np.testing.assert_array_equal(
+        visibility.VisibilityIndex.load(path, visibility._get_level_hash(game_level, BUCKET_SIZE)).visible,
+        index.visible)